@@ -1,26 +1,93 @@
 # -*- coding: utf-8 -*-
+from array import array
+from itertools import compress
 from pygameframework import Color
-from pygameframework import Schedule
+from schedule import Schedule
 from sound import SoundEffect
 from sprite import Sprite
 from counter import Counter
 from pygameframework import Direction
+from pygameframework import Coordinate
+from tile import TextCache
+
+class FreeCells(object):
+    def __init__(self, width=0, walkable=b''):
+        self._width = width
+        self._cells = array('i', compress(range(len(walkable)), walkable))
+        self._slots = array('i', [-1]) * len(walkable)
+        slots = self._slots
+        for slot, index in enumerate(self._cells):
+            slots[index] = slot
+
+    def count(self):
+        return len(self._cells)
+
+    def add(self, index):
+        if self._slots[index] >= 0: return
+        self._slots[index] = len(self._cells)
+        self._cells.append(index)
+
+    def discard(self, index):
+        slot = self._slots[index]
+        if slot < 0: return
+        self._slots[index] = -1
+        last = self._cells.pop()
+        if slot == len(self._cells): return
+        self._cells[slot] = last
+        self._slots[last] = slot
+
+    def choice(self, random):
+        y, x = divmod(random.choice(self._cells), self._width)
+        return Coordinate(x, y)
 
 class ActorMap(object):
-    def __init__(self):
+    STRIDE = 1 << 16
+    CHUNK_BITS = 4
+    def __init__(self, dirty):
+        self._dirty = dirty
         self._actor = dict()
         self._coordinate = dict()
+        self._chunks = dict()
+        self._width = 0
+        self._free = FreeCells()
+
+    def key(self, coordinate):
+        x, y = coordinate.xy()
+        return y * self.STRIDE + x
+
+    def _chunk_key(self, x, y):
+        return (y >> self.CHUNK_BITS) * self.STRIDE + (x >> self.CHUNK_BITS)
+
+    def open(self, terrain_map):
+        self._width = terrain_map.size()[0]
+        self._free = FreeCells(self._width, terrain_map.walkable_mask())
+        for coordinate in self._coordinate.values():
+            x, y = coordinate.xy()
+            self._free.discard(y * self._width + x)
+
+    def choice_free_coordinate(self, random):
+        return self._free.choice(random)
+
+    def count_free(self):
+        return self._free.count()
 
     def pickup(self, coordinate):
-        actor = self._actor[coordinate]
-        del self._actor[coordinate]
+        x, y = coordinate.xy()
+        key = y * self.STRIDE + x
+        actor = self._actor.pop(key)
         del self._coordinate[actor]
+        chunk_key = self._chunk_key(x, y)
+        chunk = self._chunks[chunk_key]
+        chunk.discard(actor)
+        if not chunk: del self._chunks[chunk_key]
+        self._free.add(y * self._width + x)
+        actor.locate(None)
+        self._dirty.mark(coordinate)
         return actor
 
     def actor(self, coordinate):
-        if coordinate in self._actor:
-            return self._actor[coordinate]
-        return None
+        x, y = coordinate.xy()
+        return self._actor.get(y * self.STRIDE + x)
 
     def count_actors(self):
         return len(self._actor)
@@ -29,18 +96,39 @@ class ActorMap(object):
         for actor in self._actor.values():
             yield actor
 
+    def actors_in(self, top_left, bottom_right):
+        left, top = top_left.xy()
+        right, bottom = bottom_right.xy()
+        for chunk_y in range(top >> self.CHUNK_BITS, ((bottom - 1) >> self.CHUNK_BITS) + 1):
+            for chunk_x in range(left >> self.CHUNK_BITS, ((right - 1) >> self.CHUNK_BITS) + 1):
+                chunk = self._chunks.get(chunk_y * self.STRIDE + chunk_x)
+                if not chunk: continue
+                for actor in chunk:
+                    x, y = self._coordinate[actor].xy()
+                    if left <= x < right and top <= y < bottom: yield actor
+
+    def actors_within(self, center, radius):
+        x, y = center.xy()
+        return self.actors_in(Coordinate(x - radius, y - radius),
+                Coordinate(x + radius + 1, y + radius + 1))
+
     def coordinate_of(self, actor):
-        try:
-            return self._coordinate[actor]
-        except KeyError:
-            return None
+        return self._coordinate.get(actor)
 
     def put(self, coordinate, actor):
-        self._actor[coordinate] = actor
+        x, y = coordinate.xy()
+        key = y * self.STRIDE + x
+        self._actor[key] = actor
         self._coordinate[actor] = coordinate
+        chunk_key = self._chunk_key(x, y)
+        if chunk_key not in self._chunks: self._chunks[chunk_key] = set()
+        self._chunks[chunk_key].add(actor)
+        self._free.discard(y * self._width + x)
+        actor.locate(coordinate)
+        self._dirty.mark(coordinate)
 
     def render(self, screen):
-        for pos, actor in self._actor.items():
+        for actor, pos in self._coordinate.items():
             actor.render(screen, pos)
 
     def to_coordinate(self, actor, direction):
@@ -53,28 +141,43 @@ class ActorMap(object):
 
     def remove_actor(self, actor):
         if not self.coordinate_of(actor): return
-        coordinate = self._coordinate[actor]
-        del self._actor[coordinate]
-        del self._coordinate[actor]
+        self.pickup(self._coordinate[actor])
 
 class Actor(object):
+    __slots__ = ('_world', '_sprite', '_status', '_skill', '_player_id', '_line')
     WAIT_TIME_MAX = 16
     WAIT_TIME_MIN = 0
+    TOUCH_DAMAGE = 10
+    FREEZE_FRAME = 150
     PLAYER_COLOR = (Color.RED, Color.AQUA, Color.YELLOW, Color.LIME)
+    FREEZE_COLOR, JOIN_COLOR = (Color.BLACK, Color.WHITE)
     CHASER_GLYPH, RUNNER_GLYPH = ('&', '@')
-    def __init__(self, player_id):
-        self._sprite = Sprite(self.RUNNER_GLYPH, self.PLAYER_COLOR[player_id])
-        self._status = Status()
+    def __init__(self, world, player_id):
+        color = self.PLAYER_COLOR[player_id % len(self.PLAYER_COLOR)]
+        self._world = world
+        self._sprite = Sprite(self.RUNNER_GLYPH, color, world.dirty())
+        self._status = Status(world.scheduler())
         self._skill = InvisibleSkill(self._status)
         self._player_id = player_id + 1
+        self._line = (None, None)
+
+    @classmethod
+    def glyph_colors(cls):
+        for glyph in (cls.CHASER_GLYPH, cls.RUNNER_GLYPH):
+            for color in cls.PLAYER_COLOR + (cls.FREEZE_COLOR, cls.JOIN_COLOR):
+                yield (glyph, color)
 
     def reset(self):
-        self._status = Status()
+        self._status = Status(self._world.scheduler())
+        self._line = (None, None)
         self.be_runner()
 
     def __str__(self):
         return '%dP %s' % (self._player_id, str(self._status))
 
+    def player_id(self):
+        return self._player_id
+
     def status(self):
         return self._status
 
@@ -82,13 +185,21 @@ class Actor(object):
         return self._status.life()
 
     def render(self, screen, position):
-        if self._status.is_invisible(): return
         self._sprite.render(screen, position)
 
+    def locate(self, position):
+        self._sprite.locate(position)
+
     def render_status(self, screen, position):
-        line = str(self._status)
-        color = self._sprite.color()
-        screen.write('[%sP] %s' % (self._player_id, line), position, color)
+        line, color = self.status_line()
+        TextCache.write(screen, line, position, color)
+
+    def status_line(self):
+        revision, line = self._line
+        if revision != self._status.revision():
+            line = '[%sP] %s' % (self._player_id, str(self._status))
+            self._line = (self._status.revision(), line)
+        return (line, self._sprite.color())
 
     def be_playing(self):
         self._status.be_playing()
@@ -126,46 +237,73 @@ class Actor(object):
         SoundEffect.play_touch()
         self.be_runner()
         other.be_chaser()
-        other.damage(10)
+        other.damage(self.TOUCH_DAMAGE)
         other.freeze()
 
     def damage(self, value):
         self._status.damage(value)
 
-    def freeze(self, frame=150):
+    def freeze(self, frame=None):
+        if frame is None: frame = self.FREEZE_FRAME
         self._status.wait(frame)
-        self.flush(Color.BLACK, frame=frame, interval=5)
+        self.flush(self.FREEZE_COLOR, frame=frame, interval=5)
 
     def flush(self, color, interval=3, frame=150):
-        flushing = Flushing(self._sprite, color, interval)
-        Schedule(frame).action(flushing.update).last(flushing.stop)
+        flushing = Flushing(self._sprite, color)
+        Schedule(self._world.scheduler(), frame, interval).action(flushing.update).last(flushing.stop)
 
     def use_skill(self):
         self._skill.active()
+        self._update_visibility()
 
     def unuse_skill(self):
         self._skill.inactive()
+        self._update_visibility()
 
     def change_skill(self, new_skill):
         self._skill.inactive()
         self._skill = new_skill
+        self._update_visibility()
+
+    def _update_visibility(self):
+        self._sprite.show(not self._status.is_invisible())
+
+    def restore(self, flags, life):
+        self._status.restore(flags, life)
+        glyph = self.CHASER_GLYPH if self._status.is_chaser() else self.RUNNER_GLYPH
+        self._sprite.change_glyph(glyph)
+        self._update_visibility()
 
 class Status(object):
+    __slots__ = ('_scheduler', '_flags', '_walk_wait_frame', '_life', '_revision')
     PLAYING, CHASER, WAIT, INVISIBLE, FORCE_VISIBLE = range(5)
-    def __init__(self):
-        self._properties = Property(
-                [self.PLAYING, self.CHASER, self.WAIT, self.INVISIBLE, self.FORCE_VISIBLE])
-        self._walk_wait_frame = 3
+    LANE_BITS = 8
+    PLAYING_MASK = 0xFF << (PLAYING * LANE_BITS)
+    CHASER_MASK = 0xFF << (CHASER * LANE_BITS)
+    WAIT_MASK = 0xFF << (WAIT * LANE_BITS)
+    INVISIBLE_MASK = 0xFF << (INVISIBLE * LANE_BITS)
+    FORCE_VISIBLE_MASK = 0xFF << (FORCE_VISIBLE * LANE_BITS)
+    START_WAIT_FRAME = 3
+    WALK_WAIT_FRAME = 2
+    RUN_WAIT_FRAME = 1
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+        self._flags = 0
+        self._walk_wait_frame = self.START_WAIT_FRAME
         self._life = 10
+        self._revision = 0
 
     def __str__(self):
-        if self._properties.is_active(self.PLAYING):
+        if self.is_playing():
             return 'Life: %-3d' % self._life
         return 'press start key'
 
     def life(self):
         return self._life
 
+    def revision(self):
+        return self._revision
+
     def wait_walk_frame(self):
         self.wait(self._walk_wait_frame)
 
@@ -175,73 +313,80 @@ class Status(object):
     def damage(self, value):
         self._life -= value
         if self._life < 0: self._life = 0
+        self._revision += 1
 
     def be_playing(self):
-        self._properties.set_properties(self.PLAYING)
+        self._set(self.PLAYING)
+        self._revision += 1
 
     def is_playing(self):
-        return self._properties.is_active(self.PLAYING)
+        return self._flags & self.PLAYING_MASK != 0
 
     def be_invisible(self):
-        self._properties.set_properties(self.INVISIBLE)
+        self._set(self.INVISIBLE)
 
     def be_visible(self):
-        self._properties.unset_properties(self.INVISIBLE)
+        self._unset(self.INVISIBLE)
 
     def is_invisible(self):
-        return self._properties.is_active(self.INVISIBLE)
+        return self._flags & self.INVISIBLE_MASK != 0
 
     def walking(self):
-        self._walk_wait_frame = 2
+        self._walk_wait_frame = self.WALK_WAIT_FRAME
 
     def running(self):
-        self._walk_wait_frame = 1
+        self._walk_wait_frame = self.RUN_WAIT_FRAME
 
     def be_chaser(self):
-        self._properties.set_properties(self.CHASER)
+        self._set(self.CHASER)
 
     def be_runner(self):
-        self._properties.unset_properties(self.CHASER)
+        self._unset(self.CHASER)
 
     def is_chaser(self):
-        return self._properties.is_active(self.CHASER)
+        return self._flags & self.CHASER_MASK != 0
 
     def is_runner(self):
         return not self.is_chaser()
 
     def wait(self, wait_frame):
-        self._properties.set_properties(self.WAIT)
-        Schedule(wait_frame).last(self.no_wait)
+        self._set(self.WAIT)
+        self._scheduler.add(wait_frame, self.no_wait)
 
     def no_wait(self):
-        self._properties.unset_properties(self.WAIT)
+        self._unset(self.WAIT)
 
     def is_waiting(self):
-        return self._properties.is_active(self.WAIT)
+        return self._flags & self.WAIT_MASK != 0
 
     def be_no_force_visible(self):
-        self._properties.unset_properties(self.FORCE_VISIBLE)
+        self._unset(self.FORCE_VISIBLE)
 
     def is_force_visible(self):
-        return self._properties.is_active(self.FORCE_VISIBLE)
-
-class Property(object):
-    def __init__(self, properties):
-        self._properties = dict()
-        for name in properties: self._properties[name] = 0
-
-    def is_active(self, name):
-        return self._properties[name] > 0
-
-    def is_inactive(self, name):
-        return not self.active(name)
-
-    def set_properties(self, name):
-        self._properties[name] += 1
-
-    def unset_properties(self, name):
-        if self._properties[name] is 0: return
-        self._properties[name] -= 1
+        return self._flags & self.FORCE_VISIBLE_MASK != 0
+
+    def active_flags(self):
+        flags = 0
+        for name in range(self.FORCE_VISIBLE + 1):
+            if (self._flags >> (name * self.LANE_BITS)) & 0xFF: flags |= 1 << name
+        return flags
+
+    def restore(self, flags, life):
+        self._flags = 0
+        for name in range(self.FORCE_VISIBLE + 1):
+            if flags & (1 << name): self._flags |= 1 << (name * self.LANE_BITS)
+        self._life = life
+        self._revision += 1
+
+    def _set(self, name):
+        shift = name * self.LANE_BITS
+        if (self._flags >> shift) & 0xFF == 0xFF: return
+        self._flags += 1 << shift
+
+    def _unset(self, name):
+        shift = name * self.LANE_BITS
+        if (self._flags >> shift) & 0xFF == 0: return
+        self._flags -= 1 << shift
 
 class Actors(object):
 
@@ -262,17 +407,43 @@ class Actors(object):
         return Ranking(self._members)
 
 class Ranking(object):
-    _tag = ('TOP', '2nd', '3rd', '4th')
+    _suffix = {1: 'st', 2: 'nd', 3: 'rd'}
     _tag_color = (Color.YELLOW, Color.WHITE, Color.SILVER, Color.GRAY)
     def __init__(self, members):
         self._members = members
-
-    def render(self, screen, pos):
-        for color, line in self._ranking_list():
-            screen.write(line, pos, color,)
+        self._key = None
+        self._lines = []
+
+    def render(self, screen, pos, limit=None):
+        lines = self.lines()
+        if limit is not None and len(lines) > limit:
+            rest = len(lines) - limit + 1
+            lines = lines[:limit - 1] + [(self._tag_color[-1], '... %d more' % rest)]
+        for color, line in lines:
+            TextCache.write(screen, line, pos, color)
             pos += Direction.DOWN
 
+    def lines(self):
+        key = tuple((member.status(), member.status().revision()) for member in self._members)
+        if key != self._key:
+            self._key = key
+            self._lines = self._ranking_list()
+        return self._lines
+
     def _ranking_list(self):
+        result = []
+        for rank, member in self.standings():
+            line = '[%s] %s' % (self._tag(rank), str(member))
+            result.append((self._tag_color[min(rank, len(self._tag_color) - 1)], line))
+        return result
+
+    def _tag(self, rank):
+        if rank == 0: return 'TOP'
+        place = rank + 1
+        suffix = 'th' if place % 100 in (11, 12, 13) else self._suffix.get(place % 10, 'th')
+        return '%d%s' % (place, suffix)
+
+    def standings(self):
         result = []
         rank = 0
         current_life = None
@@ -280,12 +451,13 @@ class Ranking(object):
             if not member.is_playing(): continue
             life = member.life()
             if current_life is not None and current_life != life: rank += 1
-            line = '[%s] %s' % (self._tag[rank], str(member))
-            result.append((self._tag_color[rank], line))
+            result.append((rank, member))
             current_life = life
         return result
 
 class Skill(object):
+    __slots__ = ('_actor', '_active', '_counter')
+    INTERVAL = 40
     def __init__(self, actor, interval):
         self._actor = actor
         self._active = False
@@ -304,8 +476,9 @@ class Skill(object):
         self._counter.reset()
 
 class InvisibleSkill(Skill):
+    __slots__ = ()
     def __init__(self, actor):
-        Skill.__init__(self, actor, 40)
+        Skill.__init__(self, actor, self.INTERVAL)
 
     def _apply(self):
         self._actor.be_invisible()
@@ -314,8 +487,9 @@ class InvisibleSkill(Skill):
         self._actor.be_visible()
 
 class DashSkill(Skill):
+    __slots__ = ()
     def __init__(self, actor):
-        Skill.__init__(self, actor, 40)
+        Skill.__init__(self, actor, self.INTERVAL)
 
     def _apply(self):
         self._actor.running()
@@ -324,14 +498,12 @@ class DashSkill(Skill):
         self._actor.walking()
 
 class Flushing(object):
-    def __init__(self, sprite, color, interval):
+    __slots__ = ('_sprite', '_change_color')
+    def __init__(self, sprite, color):
         self._sprite = sprite
         self._change_color = color
-        self._frame_counter = Counter(interval)
 
     def update(self):
-        self._frame_counter.tick()
-        if not self._frame_counter.is_over(): return
         if self._sprite.color_changed():
             self._sprite.reset_color()
         else:
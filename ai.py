@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+class DistanceField(object):
+    UNREACHABLE = 0xFFFFFFFF
+    def __init__(self, terrain_map):
+        w, h = terrain_map.size()
+        self._terrain_map = terrain_map
+        self._sources = None
+        self._distance = array('I', [self.UNREACHABLE]) * (w * h)
+        self._stamps = array('I', [0]) * (w * h)
+        self._generation = 0
+        self._frontier = []
+        self._next_frontier = []
+        self._cursor = 0
+        self._steps = 1
+
+    def sources(self):
+        return self._sources
+
+    def restart(self, sources):
+        self._generation += 1
+        for index in sources:
+            self._distance[index] = 0
+            self._stamps[index] = self._generation
+        self._sources = sources
+        self._frontier = list(sources)
+        self._next_frontier = []
+        self._cursor = 0
+        self._steps = 1
+
+    def distance(self, coordinate):
+        return self._distance[self._terrain_map.index(coordinate)]
+
+    def is_complete(self):
+        return not self._frontier
+
+    def search(self, budget):
+        w, h = self._terrain_map.size()
+        walkable = self._terrain_map.walkable_mask()
+        distance, stamps, generation = self._distance, self._stamps, self._generation
+        frontier, next_frontier = self._frontier, self._next_frontier
+        cursor, steps = self._cursor, self._steps
+        while frontier and budget > 0:
+            if cursor == len(frontier):
+                frontier, next_frontier = next_frontier, []
+                cursor, steps = 0, steps + 1
+                continue
+            end = min(len(frontier), cursor + budget)
+            budget -= end - cursor
+            for cursor in range(cursor, end):
+                index = frontier[cursor]
+                x = index % w
+                for dx in (-1, 0, 1):
+                    if not 0 <= x + dx < w: continue
+                    for dy in (-w, 0, w):
+                        neighbor = index + dx + dy
+                        if not 0 <= neighbor < w * h: continue
+                        if stamps[neighbor] == generation: continue
+                        if not walkable[neighbor]: continue
+                        stamps[neighbor] = generation
+                        distance[neighbor] = steps
+                        next_frontier.append(neighbor)
+            cursor = end
+        self._frontier, self._next_frontier = frontier, next_frontier
+        self._cursor, self._steps = cursor, steps
+        return self.is_complete()
+
+class DistanceFields(object):
+    BUDGET = 2048
+    def __init__(self, world, budget=BUDGET):
+        self._world = world
+        self._budget = budget
+        self._fields = dict()
+        self._ticks = dict()
+
+    def toward(self, group, coordinates):
+        terrain_map = self._world.terrain_map()
+        key = (terrain_map, terrain_map.revision(), group)
+        now = self._world.scheduler().now()
+        if key not in self._ticks: self._forget(key)
+        if self._ticks.get(key) != now:
+            self._ticks[key] = now
+            self._advance(key, terrain_map, coordinates)
+        return self._fields.get(key)
+
+    def _advance(self, key, terrain_map, coordinates):
+        field = self._fields.get(key)
+        if field is None: field = self._fields[key] = DistanceField(terrain_map)
+        if field.is_complete():
+            sources = tuple(sorted(terrain_map.index(c) for c in coordinates))
+            if sources == field.sources(): return
+            field.restart(sources)
+        field.search(self._budget)
+
+    def _forget(self, key):
+        for stale in [other for other in self._ticks if other[:2] != key[:2]]:
+            del self._ticks[stale]
+            self._fields.pop(stale, None)
+
+    def clear(self):
+        self._fields = dict()
+        self._ticks = dict()
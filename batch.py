@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+from actor import Actor
+from actor import Skill
+from actor import Status
+from controller import RandomController
+from engine import Simulation
+
+class Parameters(object):
+    TARGETS = (
+        ('wait_time_max', Actor, 'WAIT_TIME_MAX'),
+        ('skill_interval', Skill, 'INTERVAL'),
+        ('touch_damage', Actor, 'TOUCH_DAMAGE'),
+        ('freeze_frame', Actor, 'FREEZE_FRAME'),
+        ('walk_wait_frame', Status, 'WALK_WAIT_FRAME'),
+        ('run_wait_frame', Status, 'RUN_WAIT_FRAME'))
+    DEFAULTS = dict((name, getattr(owner, attribute))
+            for name, owner, attribute in TARGETS)
+
+    @classmethod
+    def names(cls):
+        return [name for name, owner, attribute in cls.TARGETS]
+
+    @classmethod
+    def apply(cls, parameters):
+        for name, owner, attribute in cls.TARGETS:
+            setattr(owner, attribute, parameters.get(name, cls.DEFAULTS[name]))
+
+    @classmethod
+    def grid(cls, assignments):
+        names, values = [], []
+        for assignment in assignments:
+            name, candidates = assignment.split('=')
+            if name not in cls.DEFAULTS: raise ValueError('unknown parameter: %s' % name)
+            names.append(name)
+            values.append([int(value) for value in candidates.split(',')])
+        for combination in itertools.product(*values):
+            yield dict(zip(names, combination))
+
+def play_match(task):
+    map_file, players, seed, parameters = task
+    Parameters.apply(parameters)
+    rng = random.Random(seed)
+    controllers = [RandomController(rng) for i in range(players)]
+    simulation = Simulation(map_file, controllers, seed).run()
+    standings = simulation.ranking().standings()
+    result = dict(Parameters.DEFAULTS)
+    result.update(parameters)
+    result['seed'] = seed
+    result['winner'] = standings[0][1].player_id() if standings else None
+    result['ticks'] = simulation.tick()
+    result['swaps'] = simulation.swaps()
+    result['ranking'] = ' '.join('%dP:%d' % (member.player_id(), member.life())
+            for rank, member in standings)
+    return result
+
+class ResultWriter(object):
+    FIELDS = Parameters.names() + ['seed', 'winner', 'ticks', 'swaps', 'ranking']
+    def __init__(self, stream, form):
+        self._stream = stream
+        self._csv = None
+        if form == 'csv':
+            self._csv = csv.DictWriter(stream, self.FIELDS)
+            self._csv.writeheader()
+
+    def write(self, result):
+        if self._csv: self._csv.writerow(result)
+        else: self._stream.write(json.dumps(result, sort_keys=True) + '\n')
+        self._stream.flush()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='run headless matches in parallel')
+    parser.add_argument('--map', default='data/map.data')
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--seeds', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='jsonl')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=V1,V2',
+            help='parameter values to sweep: %s' % ', '.join(Parameters.names()))
+    args = parser.parse_args(argv)
+    tasks = [(args.map, args.players, seed, parameters)
+            for parameters in Parameters.grid(args.set)
+            for seed in range(args.seeds)]
+    stream = open(args.output, 'w') if args.output else sys.stdout
+    writer = ResultWriter(stream, args.format)
+    pool = multiprocessing.Pool(args.processes)
+    try:
+        for result in pool.imap_unordered(play_match, tasks, chunksize=4):
+            writer.write(result)
+    finally:
+        pool.close()
+        pool.join()
+        if stream is not sys.stdout: stream.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
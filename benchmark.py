@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from pygameframework import Direction
+from tile import AsciiTileLocator
+from tile import NullTileSheet
+from sound import SoundEffect
+from sound import NullSoundBank
+from terrain import TerrainMap
+from stage import StageHandler
+from actor import Actor
+from actor import Actors
+from actor import Ranking
+from player import WalkCommand
+from scene import ChaceScene
+from world import World
+from controller import RandomController
+
+class StubScreen(object):
+    def __init__(self):
+        self.draws = 0
+
+    def fill(self):
+        pass
+
+    def draw(self, coordinate, graphic):
+        self.draws += 1
+
+    def write(self, text, coordinate, color):
+        self.draws += 1
+
+class StubStatusWindow(object):
+    def render(self, window):
+        pass
+
+    def render_changes(self, window):
+        pass
+
+class Stage(StageHandler):
+    WALL_RATE = 0.1
+    def __init__(self, size, actor_count, seed):
+        StageHandler.__init__(self, World(seed))
+        self._random = random.Random(seed)
+        if 'x' in size:
+            width, height = [int(value) for value in size.split('x')]
+            self._world.provide(self._terrain(width, height))
+        else:
+            self._world.load(size)
+        actor_count = min(actor_count, self._terrain_map.count_walkable() // 2)
+        self.actors = [Actor(self._world, i % len(Actor.PLAYER_COLOR))
+                for i in range(actor_count)]
+        for actor in self.actors:
+            actor.be_playing()
+            self._actor_map.put(self.choice_random_open_coordinate(), actor)
+
+    def _terrain(self, width, height):
+        floor, wall = StageHandler.terrain('.'), StageHandler.terrain('#')
+        ids = bytearray(width * height)
+        for index in range(width * height):
+            y, x = divmod(index, width)
+            if x in (0, width - 1) or y in (0, height - 1) or\
+                    self._random.random() < self.WALL_RATE:
+                ids[index] = 1
+        walkable = ids.translate(bytes(bytearray([1, 0]) + bytearray(254)))
+        return TerrainMap(width, height, [floor, wall], ids, walkable)
+
+    def world(self):
+        return self._world
+
+    def terrain_map(self):
+        return self._terrain_map
+
+    def actor_map(self):
+        return self._actor_map
+
+    def random_direction(self):
+        return self._random.choice(Benchmark.DIRECTIONS)
+
+class Benchmark(object):
+    DIRECTIONS = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT,
+            Direction.UPPER_LEFT, Direction.UPPER_RIGHT,
+            Direction.LOWER_LEFT, Direction.LOWER_RIGHT)
+    def __init__(self, min_time):
+        self._min_time = min_time
+        self._results = []
+
+    def results(self):
+        return self._results
+
+    def measure(self, name, stage, function):
+        operations = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < self._min_time:
+            operations += function()
+            elapsed = time.perf_counter() - start
+        w, h = stage.terrain_map().size()
+        result = dict(benchmark=name, width=w, height=h, actors=len(stage.actors),
+                operations=operations, seconds=elapsed,
+                usec_per_operation=elapsed * 1e6 / operations)
+        self._results.append(result)
+        sys.stderr.write('%-44s %5dx%-5d %5d actors %12.3f usec/op\n' %
+                (name, w, h, len(stage.actors), result['usec_per_operation']))
+
+    def run(self, size, actor_count, seed):
+        stage = Stage(size, actor_count, seed)
+        self.measure('TerrainMap.render', stage, self._terrain_render(stage))
+        self.measure('ActorMap.pickup/put', stage, self._pickup_put(stage))
+        self.measure('ActorMap.move_actor', stage, self._move_actor(stage))
+        self.measure('WalkCommand.execute', stage, self._walk(stage))
+        self.measure('StageHandler.choice_random_open_coordinate', stage,
+                self._choice(stage))
+        self.measure('Ranking._ranking_list', stage, self._ranking(stage))
+        self.measure('ChaceScene.update+render', stage, self._scene_tick(stage))
+
+    def _terrain_render(self, stage):
+        screen = StubScreen()
+        def render():
+            stage.terrain_map().render(screen)
+            return 1
+        return render
+
+    def _pickup_put(self, stage):
+        actor_map = stage.actor_map()
+        def pickup_put():
+            for actor in stage.actors:
+                coordinate = actor_map.coordinate_of(actor)
+                actor_map.put(coordinate, actor_map.pickup(coordinate))
+            return len(stage.actors)
+        return pickup_put
+
+    def _move_actor(self, stage):
+        actor_map, terrain_map = stage.actor_map(), stage.terrain_map()
+        def move_actor():
+            moves = 0
+            for actor in stage.actors:
+                direction = stage.random_direction()
+                to = actor_map.to_coordinate(actor, direction)
+                if not terrain_map.is_walkable(to) or actor_map.actor(to): continue
+                actor_map.move_actor(actor, direction)
+                moves += 1
+            return max(moves, 1)
+        return move_actor
+
+    def _walk(self, stage):
+        commands = [WalkCommand(stage.world(), actor) for actor in stage.actors]
+        def walk():
+            for command in commands:
+                command.execute(stage.random_direction())
+            stage.world().moves().resolve()
+            for actor in stage.actors:
+                actor.status().no_wait()
+            stage.world().scheduler().clear()
+            return len(commands)
+        return walk
+
+    def _choice(self, stage):
+        def choice():
+            stage.choice_random_open_coordinate()
+            return 1
+        return choice
+
+    def _ranking(self, stage):
+        ranking = Ranking(stage.actors)
+        def ranking_list():
+            ranking._ranking_list()
+            return 1
+        return ranking_list
+
+    def _scene_tick(self, stage):
+        world = stage.world()
+        for actor in stage.actors:
+            stage.remove_actor(actor)
+        rng = random.Random(0)
+        controllers = [RandomController(rng) for actor in stage.actors]
+        world.players().initialize(stage.actors)
+        actors = Actors(stage.actors)
+        scene = ChaceScene(world, StubStatusWindow(), actors)
+        world.scenes().register_ranking_scene(scene)
+        screen = StubScreen()
+        for controller in controllers:
+            controller.update()
+        world.dirty().mark_all()
+        def tick():
+            if actors.exists_deadman(): actors.reset()
+            scene.update(controllers, None)
+            scene.render(screen)
+            world.scheduler().update()
+            for controller in controllers:
+                controller.update()
+            return 1
+        tick()
+        return tick
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='benchmark the frame hot path')
+    parser.add_argument('--sizes', default='data/map.data,200x200,1000x1000,2000x2000',
+            help='comma separated WIDTHxHEIGHT synthetic maps or map files')
+    parser.add_argument('--actors', default='4,100,1000')
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+    AsciiTileLocator.provide(NullTileSheet())
+    SoundEffect.provide(NullSoundBank())
+    benchmark = Benchmark(args.min_time)
+    for size in args.sizes.split(','):
+        for actor_count in [int(value) for value in args.actors.split(',')]:
+            benchmark.run(size, actor_count, args.seed)
+    report = dict(python=platform.python_version(), platform=platform.platform(),
+            results=benchmark.results())
+    stream = open(args.output, 'w') if args.output else sys.stdout
+    json.dump(report, stream, indent=2, sort_keys=True)
+    stream.write('\n')
+    if stream is not sys.stdout: stream.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import pygame
+from pygameframework import Coordinate
+from stage import StageHandler
+from profiler import FrameProfiler
+from terrain import ChunkLayer
+
+class Camera(StageHandler):
+    BACKGROUND = (0, 0, 0)
+    def __init__(self, world, surface, window, position, size, grid_size, visibility=None):
+        StageHandler.__init__(self, world)
+        self._surface = surface
+        self._window = window
+        self._position = position
+        self._size = size
+        self._grid_size = grid_size
+        self._layer = ChunkLayer(grid_size)
+        self._origin = Coordinate(0, 0)
+        self._target = None
+        self._visibility = visibility
+        self._mask = None
+
+    def follow(self, actor):
+        self._target = actor
+
+    def origin(self):
+        return self._origin
+
+    def render(self, cells=None):
+        moved = self._track()
+        mask = self._visibility.mask() if self._visibility else None
+        if moved or cells is None or (mask is None) != (self._mask is None):
+            self._mask = mask
+            self._render_all()
+            return
+        if mask is not self._mask:
+            w = self._terrain_map.size()[0]
+            changed = [Coordinate(index % w, index // w) for index in mask ^ self._mask]
+            self._mask = mask
+            cells = changed + list(cells)
+        self._render_cells(cells)
+
+    def _track(self):
+        coordinate = self._target and self._actor_map.coordinate_of(self._target)
+        x, y = coordinate.xy() if coordinate else self._origin.xy()
+        w, h = self._size.xy()
+        mw, mh = self._terrain_map.size()
+        if coordinate: x, y = x - w // 2, y - h // 2
+        origin = Coordinate(max(0, min(x, mw - w)), max(0, min(y, mh - h)))
+        if origin == self._origin: return False
+        self._origin = origin
+        return True
+
+    def _render_all(self):
+        gw, gh = self._grid_size.xy()
+        w, h = self._size.xy()
+        vx, vy = self._position.xy()
+        pixel = Coordinate(vx * gw, vy * gh)
+        FrameProfiler.start('terrain')
+        self._surface.fill(self.BACKGROUND, pygame.Rect(vx * gw, vy * gh, w * gw, h * gh))
+        if self._mask is not None:
+            FrameProfiler.stop('terrain')
+            self._render_visible()
+            return
+        self._layer.render(self._surface, pixel, self._terrain_map, self._origin, self._size)
+        FrameProfiler.stop('terrain')
+        FrameProfiler.start('actors')
+        ox, oy = self._origin.xy()
+        actor_map = self._actor_map
+        for actor in actor_map.actors_in(self._origin, Coordinate(ox + w, oy + h)):
+            x, y = actor_map.coordinate_of(actor).xy()
+            actor.render(self._window, Coordinate(x - ox + vx, y - oy + vy))
+        FrameProfiler.stop('actors')
+
+    def _render_visible(self):
+        mw = self._terrain_map.size()[0]
+        self._render_cells([Coordinate(index % mw, index // mw) for index in self._mask])
+
+    def _render_cells(self, cells):
+        ox, oy = self._origin.xy()
+        vx, vy = self._position.xy()
+        w, h = self._size.xy()
+        mask, hidden = self._mask, self.terrain(' ')
+        drawn = []
+        FrameProfiler.start('terrain')
+        for coordinate in cells:
+            x, y = coordinate.xy()
+            if not (ox <= x < ox + w and oy <= y < oy + h): continue
+            position = Coordinate(x - ox + vx, y - oy + vy)
+            if mask is not None and self._terrain_map.index(coordinate) not in mask:
+                hidden.lender(self._window, position)
+                continue
+            self._terrain_map.render_cell(self._window, coordinate, position)
+            drawn.append((coordinate, position))
+        FrameProfiler.stop('terrain')
+        FrameProfiler.start('actors')
+        for coordinate, position in drawn:
+            actor = self._actor_map.actor(coordinate)
+            if actor: actor.render(self._window, position)
+        FrameProfiler.stop('actors')
@@ -4,70 +4,194 @@ from pygameframework import GridWindow
 from pygameframework import AsciiTileSheet
 from pygameframework import Coordinate
 from pygameframework import Key
+from pygameframework import Color
 import sys
 from tile import AsciiTileLocator
+from sound import SoundEffect
+from sound import SoundBank
 from terrain import TerrainMapHandler
+from camera import Camera
+from fov import Visibility
 from actor import Actor
 from actor import Actors
-from scene import Scene
 from scene import RankingScene
 from scene import ChaceScene
-from stage import StageHandler
-from player import PlayerHandler
+from world import World
+from profiler import FrameProfiler
+from clock import FixedClock
+from controller import TickController
 
 class StatusWindow(object):
     def __init__(self, actors, position):
         self._actors = actors
         self._position = position
+        self._lines = [None] * len(actors)
 
     def render(self, window):
+        self._lines = [None] * len(self._actors)
+        self.render_changes(window)
+
+    def render_changes(self, window):
         x, y = self._position.xy()
         for index, actor in enumerate(self._actors):
-            actor.render_status(window, Coordinate(x, index+y))
+            line = actor.status_line()
+            if line == self._lines[index]: continue
+            position = Coordinate(x, index+y)
+            if self._lines[index]: self._erase(window, position, self._lines[index])
+            actor.render_status(window, position)
+            self._lines[index] = line
+
+    def _erase(self, window, position, line):
+        blank = AsciiTileLocator.get_tile(' ', Color.BLACK)
+        x, y = position.xy()
+        text, color = line
+        for dx in range(len(text) + 1):
+            window.draw(Coordinate(x+dx, y), blank)
 
     def add(self, status):
         self._status.append(status)
 
-class Chase(Game, StageHandler):
+class Chase(Game):
     POSITION = Coordinate(0, 0)
     GRID_SIZE = Coordinate(10, 18)
     MAX_PLAYER = 4
-    def __init__(self):
+    PROFILER_POSITION = Coordinate(36, 18)
+    PROFILER_KEY = ord('p')
+    MAP_FILE = 'data/map.data'
+    VIEW_SIZE = Coordinate(64, 18)
+    def __init__(self, bot_count=0, seed=None, recorder=None, replay=None, score_store=None,
+            split=False, fog=False, map_file=None):
         Game.__init__(self)
-        StageHandler.__init__(self)
+        self._world = None
         self._screen = None
+        self._profiler_key_down = False
+        self._bot_count = bot_count
+        self._seed = seed
+        self._recorder = recorder
+        self._replay = replay
+        self._score_store = score_store
+        self._split = split
+        self._fog = fog
+        self._map_file = map_file or (replay.map_file if replay else self.MAP_FILE)
+        self._clock = FixedClock()
+        self._replay_controllers = replay.controllers() if replay else None
+        self._tick_controllers = None
 
     def initialize(self, screen):
         tile_sheet = AsciiTileSheet().initialize('Courier New', 18)
         AsciiTileLocator.provide(tile_sheet)
-        StageHandler.initialize()
-        TerrainMapHandler.load('data/map.data')
-        actor_list = [Actor(player_id) for player_id in range(self.MAX_PLAYER)]
-        PlayerHandler.initialize(actor_list)
+        AsciiTileLocator.prewarm(TerrainMapHandler.glyph_colors())
+        AsciiTileLocator.prewarm(Actor.glyph_colors())
+        SoundEffect.provide(SoundBank())
+        self._world = world = World(self._seed)
+        world.load(self._map_file)
+        player_count = self.MAX_PLAYER + self._bot_count
+        actor_list = [Actor(world, player_id) for player_id in range(player_count)]
+        world.players().initialize(actor_list, self._bot_count)
         status_window = StatusWindow(
-                [actor for actor in actor_list],\
+                actor_list[:self.MAX_PLAYER],\
                 Coordinate(0, 18))
-        self._screen = window = GridWindow(screen, self.POSITION, self.GRID_SIZE)
+        self._screen = GridWindow(screen, self.POSITION, self.GRID_SIZE)
         actors = Actors(actor_list)
-        Scene.register_chase_scene(ChaceScene(status_window, actors))
-        Scene.register_ranking_scene(RankingScene(actors))
-        Scene.change_chase_scene()
+        cameras = self.cameras(world, screen, actor_list[:self.MAX_PLAYER])
+        world.scenes().register_chase_scene(ChaceScene(world, status_window, actors, cameras))
+        world.scenes().register_ranking_scene(RankingScene(world, actors, self._score_store))
+        world.scenes().change_chase_scene()
+
+    def cameras(self, world, surface, targets):
+        w, h = self.VIEW_SIZE.xy()
+        if not self._split:
+            views = [(Coordinate(0, 0), self.VIEW_SIZE)]
+        else:
+            size = Coordinate(w // 2, h // 2)
+            views = [(Coordinate(x, y), size) for y in (0, h // 2) for x in (0, w // 2)]
+        shared = Visibility(world, targets) if self._fog and not self._split else None
+        cameras = []
+        for (position, size), target in zip(views, targets):
+            visibility = shared
+            if self._fog and self._split: visibility = Visibility(world, [target])
+            camera = Camera(world, surface, self._screen, position, size, self.GRID_SIZE,
+                    visibility)
+            camera.follow(target)
+            cameras.append(camera)
+        return cameras
 
     def update(self):
-        if Key.ESCAPE in self._keyboard.pressed_keys(): sys.exit()
-        Scene.update(self._controllers, self._keyboard)
+        FrameProfiler.start('update')
+        self._handle_keyboard()
+        if not self._replay: self._collect_input()
+        for step in range(self._clock.advance()):
+            self._tick(self._input_controllers())
+        FrameProfiler.gauge('skipped', self._clock.skipped())
+        FrameProfiler.stop('update')
+
+    def _handle_keyboard(self):
+        down_keys = self._keyboard.pressed_keys()
+        if Key.ESCAPE in down_keys: sys.exit()
+        self._toggle_profiler(self.PROFILER_KEY in down_keys)
+
+    def _tick(self, controllers):
+        if self._recorder: self._recorder.record(controllers)
+        self._world.scenes().update(controllers, self._keyboard)
+        FrameProfiler.start('scheduler')
+        FrameProfiler.gauge('schedules', self._world.scheduler().count())
+        self._world.scheduler().update()
+        FrameProfiler.stop('scheduler')
+
+    def _collect_input(self):
+        if self._tick_controllers is None:
+            self._tick_controllers = [TickController(controller)
+                    for controller in self._controllers]
+        for controller in self._tick_controllers:
+            controller.collect()
+
+    def _input_controllers(self):
+        controllers = self._replay_controllers or self._tick_controllers
+        for controller in controllers:
+            controller.update()
+        return controllers
+
+    def _toggle_profiler(self, key_down):
+        if key_down and not self._profiler_key_down:
+            FrameProfiler.toggle_overlay()
+            self._world.dirty().mark_all()
+        self._profiler_key_down = key_down
 
     def render(self):
-        Scene.render(self._screen)
+        FrameProfiler.start('render')
+        self._world.scenes().render(self._screen)
+        FrameProfiler.stop('render')
+        FrameProfiler.render(self._screen, self.PROFILER_POSITION)
+        FrameProfiler.end_frame()
 
 if __name__ == '__main__':
+    import atexit
+    import random
     from pygameframework.framework import GameRunner
+    from replay import InputRecorder
+    from score import ScoreStore
     CONTROLLER_NUM = 4
-    runner = GameRunner(Chase())\
+    if '--profile' in sys.argv: FrameProfiler.enable('profile.jsonl')
+    BOT_NUM = int(sys.argv[sys.argv.index('--bots') + 1]) if '--bots' in sys.argv else 0
+    SEED = int(sys.argv[sys.argv.index('--seed') + 1]) if '--seed' in sys.argv\
+            else random.randrange(1 << 32)
+    recorder = None
+    if '--record' in sys.argv:
+        try:
+            recorder = InputRecorder(sys.argv[sys.argv.index('--record') + 1],
+                    Chase.MAP_FILE, SEED, BOT_NUM)
+        except ValueError as error:
+            sys.exit(str(error))
+        atexit.register(recorder.close)
+    score_store = ScoreStore('scores.db')
+    atexit.register(score_store.close)
+    chase = Chase(BOT_NUM, SEED, recorder, score_store=score_store, split='--split' in sys.argv,
+            fog='--fog' in sys.argv)
+    runner = GameRunner(chase)\
         .initialize_system()\
         .initialize_screen(640, 480, 16)\
         .initialize_controller(CONTROLLER_NUM, 'config.ini')\
         .set_font('Courier New', 18)\
-        .set_fps(30)\
+        .set_fps(FixedClock.RATE)\
         .set_caption('*** Chase ***')
     runner.run()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import time
+
+class FixedClock(object):
+    RATE = 30
+    MAX_STEPS = 5
+    def __init__(self, rate=RATE, max_steps=MAX_STEPS, timer=time.perf_counter):
+        self._step = 1.0 / rate
+        self._max_steps = max_steps
+        self._timer = timer
+        self._last = None
+        self._lag = 0.0
+        self._ticks = 0
+        self._skipped = 0
+        self._dropped = 0
+
+    def advance(self):
+        now = self._timer()
+        if self._last is None: self._last = now - self._step
+        self._lag += now - self._last
+        self._last = now
+        steps = int(self._lag / self._step + 0.5)
+        if steps > self._max_steps:
+            self._dropped += steps - self._max_steps
+            steps = self._max_steps
+            self._lag = 0.0
+        else:
+            self._lag -= steps * self._step
+        self._ticks += steps
+        self._skipped += max(0, steps - 1)
+        return steps
+
+    def ticks(self):
+        return self._ticks
+
+    def skipped(self):
+        return self._skipped
+
+    def dropped(self):
+        return self._dropped
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+class ScriptedController(object):
+    def __init__(self, script):
+        self._script = iter(script)
+        self._pressed = set()
+        self._down = set()
+        self._mask = 0
+
+    def update(self):
+        pressed = set(next(self._script, ()))
+        self._down = pressed - self._pressed
+        self._pressed = pressed
+        self._mask = KeyMask.encode(pressed)
+
+    def pressed_keys(self):
+        return self._pressed
+
+    def pressed_mask(self):
+        return self._mask
+
+    def down_keys(self):
+        return self._down
+
+class RandomController(ScriptedController):
+    KEYS = ('up', 'down', 'left', 'right', 'skill')
+    CHANGE_RATE = 0.1
+    def __init__(self, random):
+        ScriptedController.__init__(self, self._keys(random))
+
+    def _keys(self, random):
+        yield ('start',)
+        keys = ()
+        while True:
+            if random.random() < self.CHANGE_RATE:
+                keys = random.sample(self.KEYS, random.randint(0, 2))
+            yield keys
+
+class KeyMask(object):
+    KEYS = ('up', 'down', 'left', 'right', 'skill', 'start')
+    UP, DOWN, LEFT, RIGHT, SKILL, START = (1, 2, 4, 8, 16, 32)
+    DIRECTIONS = UP | DOWN | LEFT | RIGHT
+    BITS = dict(zip(KEYS, (UP, DOWN, LEFT, RIGHT, SKILL, START)))
+
+    @classmethod
+    def pressed(cls, controller):
+        pressed_mask = getattr(controller, 'pressed_mask', None)
+        if pressed_mask: return pressed_mask()
+        return cls.encode(controller.pressed_keys())
+
+    @classmethod
+    def encode(cls, keys):
+        mask = 0
+        for key in keys:
+            mask |= cls.BITS.get(key, 0)
+        return mask
+
+    @classmethod
+    def decode(cls, mask):
+        return set(key for key in cls.KEYS if mask & cls.BITS[key])
+
+class MaskController(ScriptedController):
+    def __init__(self):
+        ScriptedController.__init__(self, ())
+        self._press = 0
+
+    def press(self, mask):
+        self._press = mask
+
+    def mask(self):
+        return self._press
+
+    def update(self):
+        pressed = KeyMask.decode(self._press)
+        self._down = pressed - self._pressed
+        self._pressed = pressed
+        self._mask = self._press
+
+class TickController(object):
+    def __init__(self, controller):
+        self._controller = controller
+        self._seen = set()
+        self._pressed = set()
+        self._down = set()
+        self._mask = 0
+
+    def collect(self):
+        self._seen |= self._controller.down_keys()
+
+    def update(self):
+        pressed = set(self._controller.pressed_keys()) | self._seen
+        self._seen = set()
+        self._down = pressed - self._pressed
+        self._pressed = pressed
+        self._mask = KeyMask.encode(pressed)
+
+    def pressed_keys(self):
+        return self._pressed
+
+    def pressed_mask(self):
+        return self._mask
+
+    def down_keys(self):
+        return self._down
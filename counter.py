@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 class Counter(object):
+    __slots__ = ('_end', '_current')
     def __init__(self, end):
         self._end = end
         self._current = 0
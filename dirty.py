@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+class DirtyCells(object):
+    def __init__(self):
+        self._cells = set()
+        self._all = True
+
+    def mark(self, coordinate):
+        self._cells.add(coordinate)
+
+    def mark_all(self):
+        self._all = True
+
+    def is_all(self):
+        return self._all
+
+    def cells(self):
+        return self._cells
+
+    def clear(self):
+        self._cells = set()
+        self._all = False
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import random
+import sys
+import time
+from tile import AsciiTileLocator
+from tile import NullTileSheet
+from sound import SoundEffect
+from sound import NullSoundBank
+from stage import StageHandler
+from actor import Actor
+from actor import Actors
+from world import World
+from controller import RandomController
+
+class Simulation(StageHandler):
+    MAX_TICK = 30 * 60 * 10
+    def __init__(self, map_file, controllers, seed=None, max_tick=MAX_TICK, bot_count=0,
+            recorder=None):
+        StageHandler.__init__(self, World(seed).load(map_file))
+        self._controllers = controllers
+        self._recorder = recorder
+        self._max_tick = max_tick
+        self._tick = 0
+        self._swaps = 0
+        AsciiTileLocator.provide(NullTileSheet())
+        SoundEffect.provide(NullSoundBank())
+        player_count = len(controllers) + bot_count
+        self._actor_list = [Actor(self._world, player_id) for player_id in range(player_count)]
+        self._actors = Actors(self._actor_list)
+        self._world.players().initialize(self._actor_list, bot_count)
+
+    def tick(self):
+        return self._tick
+
+    def swaps(self):
+        return self._swaps
+
+    def world(self):
+        return self._world
+
+    def actors(self):
+        return self._actor_list
+
+    def actor_map(self):
+        return self._actor_map
+
+    def ranking(self):
+        return self._actors.ranking()
+
+    def is_over(self):
+        return self._actors.exists_deadman() or self._tick >= self._max_tick
+
+    def step(self):
+        for controller in self._controllers:
+            controller.update()
+        if self._recorder: self._recorder.record(self._controllers)
+        chasers = [actor for actor in self._actor_list if actor.is_chaser()]
+        self._world.players().update(self._controllers, None)
+        self._swaps += len([actor for actor in chasers if not actor.is_chaser()])
+        self._world.scheduler().update()
+        self._world.dirty().clear()
+        self._tick += 1
+
+    def run(self):
+        while not self.is_over():
+            self.step()
+        return self
+
+if __name__ == '__main__':
+    MATCHES = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    start = time.time()
+    ticks = 0
+    for seed in range(MATCHES):
+        rng = random.Random(seed)
+        controllers = [RandomController(rng) for i in range(4)]
+        ticks += Simulation('data/map.data', controllers, seed).run().tick()
+    elapsed = time.time() - start
+    print('%d matches, %d ticks, %.2f sec (%.0f ticks/sec)' %
+            (MATCHES, ticks, elapsed, ticks / elapsed))
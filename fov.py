@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from stage import StageHandler
+
+class FieldOfView(object):
+    OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+               (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+    CACHE_SIZE = 1024
+    _fields = OrderedDict()
+
+    @classmethod
+    def of(cls, terrain_map, coordinate, radius):
+        key = (terrain_map, terrain_map.revision(), terrain_map.index(coordinate), radius)
+        if key in cls._fields:
+            field = cls._fields.pop(key)
+        else:
+            field = cls._shadowcast(terrain_map, coordinate, radius)
+            if len(cls._fields) >= cls.CACHE_SIZE: cls._fields.popitem(last=False)
+        cls._fields[key] = field
+        return field
+
+    @classmethod
+    def clear(cls):
+        cls._fields = OrderedDict()
+
+    @classmethod
+    def _shadowcast(cls, terrain_map, coordinate, radius):
+        x, y = coordinate.xy()
+        visible = set([terrain_map.index(coordinate)])
+        for octant in cls.OCTANTS:
+            cls._cast(terrain_map, x, y, 1, 1.0, 0.0, radius, octant, visible)
+        return frozenset(visible)
+
+    @classmethod
+    def _cast(cls, terrain_map, cx, cy, row, start, end, radius, octant, visible):
+        if start < end: return
+        w, h = terrain_map.size()
+        walkable = terrain_map.walkable_mask()
+        xx, xy, yx, yy = octant
+        new_start = start
+        for j in range(row, radius + 1):
+            blocked = False
+            for dx in range(-j, 1):
+                dy = -j
+                left_slope, right_slope = (dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5)
+                if start < right_slope: continue
+                if end > left_slope: break
+                x, y = cx + dx * xx + dy * xy, cy + dx * yx + dy * yy
+                opaque = True
+                if 0 <= x < w and 0 <= y < h:
+                    index = y * w + x
+                    if dx * dx + dy * dy <= radius * radius: visible.add(index)
+                    opaque = not walkable[index]
+                if blocked:
+                    if opaque:
+                        new_start = right_slope
+                        continue
+                    blocked = False
+                    start = new_start
+                elif opaque and j < radius:
+                    blocked = True
+                    cls._cast(terrain_map, cx, cy, j + 1, start, left_slope, radius,
+                            octant, visible)
+                    new_start = right_slope
+            if blocked: break
+
+class Visibility(StageHandler):
+    RADIUS = 8
+    def __init__(self, world, viewers, radius=RADIUS):
+        StageHandler.__init__(self, world)
+        self._viewers = viewers
+        self._radius = radius
+        self._positions = None
+        self._mask = None
+
+    def mask(self):
+        terrain_map = self._terrain_map
+        positions = (terrain_map,) +\
+                tuple(self._actor_map.coordinate_of(viewer) for viewer in self._viewers)
+        if positions == self._positions: return self._mask
+        self._positions = positions
+        fields = [FieldOfView.of(terrain_map, position, self._radius)
+                for position in positions[1:] if position]
+        self._mask = frozenset().union(*fields)
+        return self._mask
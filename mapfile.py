@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import mmap
+import struct
+import sys
+
+class MapFile(object):
+    MAGIC = b'CHSM'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHIIII')
+    ALIGNMENT = mmap.ALLOCATIONGRANULARITY
+
+    @classmethod
+    def is_compiled(cls, filename):
+        with open(filename, 'rb') as f:
+            return f.read(len(cls.MAGIC)) == cls.MAGIC
+
+    @classmethod
+    def read_text(cls, filename, walkable_glyphs):
+        with open(filename, 'r') as f:
+            lines = [line.rstrip('\n') for line in f]
+        w, h = len(lines[0]), len(lines)
+        glyphs = sorted(set(''.join(lines)) | set(' '))
+        to_id = cls._table((ord(glyph), index) for index, glyph in enumerate(glyphs))
+        ids = bytearray()
+        for line in lines:
+            ids += line[:w].ljust(w).encode('latin-1').translate(to_id)
+        to_walkable = cls._table((index, 1) for index, glyph in enumerate(glyphs)
+                if glyph in walkable_glyphs)
+        return (w, h, glyphs, ids, bytearray(ids.translate(to_walkable)))
+
+    @classmethod
+    def _table(cls, pairs):
+        table = bytearray(256)
+        for key, value in pairs: table[key] = value
+        return bytes(table)
+
+    @classmethod
+    def write(cls, filename, width, height, glyphs, ids, walkable):
+        palette = ''.join(glyphs).encode('latin-1')
+        cells_offset = cls._align(cls.HEADER.size + len(palette))
+        walkable_offset = cls._align(cells_offset + len(ids))
+        with open(filename, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(palette),
+                width, height, cells_offset, walkable_offset))
+            f.write(palette)
+            f.seek(cells_offset)
+            f.write(ids)
+            f.seek(walkable_offset)
+            f.write(walkable)
+
+    @classmethod
+    def _align(cls, offset):
+        return (offset + cls.ALIGNMENT - 1) // cls.ALIGNMENT * cls.ALIGNMENT
+
+    @classmethod
+    def open(cls, filename):
+        with open(filename, 'rb') as f:
+            magic, version, palette_size, w, h, cells_offset, walkable_offset =\
+                    cls.HEADER.unpack(f.read(cls.HEADER.size))
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError('%s is not a compiled map' % filename)
+            glyphs = list(f.read(palette_size).decode('latin-1'))
+            ids = cls._map(f, cells_offset, w * h)
+            walkable = cls._map(f, walkable_offset, w * h)
+        return (w, h, glyphs, ids, walkable)
+
+    @classmethod
+    def _map(cls, f, offset, length):
+        if offset % mmap.ALLOCATIONGRANULARITY:
+            f.seek(offset)
+            return bytearray(f.read(length))
+        return mmap.mmap(f.fileno(), length, access=mmap.ACCESS_COPY, offset=offset)
+
+    @classmethod
+    def compile(cls, source, destination, walkable_glyphs):
+        cls.write(destination, *cls.read_text(source, walkable_glyphs))
+
+if __name__ == '__main__':
+    from terrain import TerrainMapHandler
+    if len(sys.argv) != 3:
+        sys.exit('usage: python mapfile.py SOURCE DESTINATION')
+    MapFile.compile(sys.argv[1], sys.argv[2], TerrainMapHandler.walkable_glyphs())
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+from pygameframework import Coordinate
+from controller import KeyMask
+from controller import MaskController
+from engine import Simulation
+from stage import StageHandler
+
+class Snapshot(object):
+    POSITION, FLAGS, LIFE = (1, 2, 4)
+    OFF_MAP = 0xFFFF
+    HEADER = struct.Struct('<IH')
+    ENTRY = struct.Struct('<HB')
+    FIELDS = ((POSITION, struct.Struct('<HH')),
+              (FLAGS, struct.Struct('<B')),
+              (LIFE, struct.Struct('<H')))
+
+    @classmethod
+    def capture(cls, actor_map, actors):
+        states = []
+        for actor in actors:
+            coordinate = actor_map.coordinate_of(actor)
+            position = coordinate.xy() if coordinate else (cls.OFF_MAP, cls.OFF_MAP)
+            status = actor.status()
+            states.append((position, (status.active_flags(),), (status.life(),)))
+        return states
+
+    @classmethod
+    def encode(cls, tick, previous, current):
+        entries = []
+        for index, state in enumerate(current):
+            old = previous[index] if index < len(previous) else (None, None, None)
+            changed = 0
+            values = b''
+            for field, (bit, form) in enumerate(cls.FIELDS):
+                if old[field] == state[field]: continue
+                changed |= bit
+                values += form.pack(*state[field])
+            if changed: entries.append(cls.ENTRY.pack(index, changed) + values)
+        return cls.HEADER.pack(tick, len(entries)) + b''.join(entries)
+
+    @classmethod
+    def decode(cls, payload):
+        tick, count = cls.HEADER.unpack_from(payload)
+        offset = cls.HEADER.size
+        entries = []
+        for i in range(count):
+            index, changed = cls.ENTRY.unpack_from(payload, offset)
+            offset += cls.ENTRY.size
+            fields = [None, None, None]
+            for field, (bit, form) in enumerate(cls.FIELDS):
+                if not changed & bit: continue
+                fields[field] = form.unpack_from(payload, offset)
+                offset += form.size
+            entries.append((index, fields))
+        return tick, entries
+
+class Message(object):
+    LENGTH = struct.Struct('<I')
+    WELCOME = struct.Struct('<BH')
+
+    @classmethod
+    def frame(cls, payload):
+        return cls.LENGTH.pack(len(payload)) + payload
+
+    @classmethod
+    async def read(cls, reader):
+        length, = cls.LENGTH.unpack(await reader.readexactly(cls.LENGTH.size))
+        return await reader.readexactly(length)
+
+class Room(object):
+    def __init__(self, map_file, slots, bot_count=0):
+        self._map_file = map_file
+        self._controllers = [MaskController() for i in range(slots)]
+        self._bot_count = bot_count
+        self._clients = dict()
+        self._simulation = None
+        self._snapshot = []
+        self._new_match()
+
+    def actor_count(self):
+        return len(self._controllers) + self._bot_count
+
+    def map_file(self):
+        return self._map_file
+
+    def _new_match(self):
+        self._simulation = Simulation(self._map_file, self._controllers,
+                bot_count=self._bot_count, max_tick=sys.maxsize)
+        self._snapshot = []
+
+    def step(self):
+        if self._simulation.is_over(): self._new_match()
+        self._simulation.step()
+        self._broadcast()
+
+    def _broadcast(self):
+        tick = self._simulation.tick()
+        current = Snapshot.capture(self._simulation.actor_map(), self._simulation.actors())
+        delta = Message.frame(Snapshot.encode(tick, self._snapshot, current))
+        full = None
+        if any(client['fresh'] for client in self._clients.values()):
+            full = Message.frame(Snapshot.encode(tick, [], current))
+        self._snapshot = current
+        for writer, client in list(self._clients.items()):
+            if writer.transport.get_write_buffer_size() > GameServer.WRITE_BUFFER_LIMIT:
+                writer.close()
+                continue
+            writer.write(full if client['fresh'] else delta)
+            client['fresh'] = False
+
+    def free_slot(self):
+        used = set(client['slot'] for client in self._clients.values())
+        for slot in range(len(self._controllers)):
+            if slot not in used: return slot
+        return None
+
+    def join(self, writer, slot):
+        self._clients[writer] = dict(slot=slot, fresh=True)
+        return self._controllers[slot]
+
+    def leave(self, writer):
+        self._controllers[self._clients.pop(writer)['slot']].press(0)
+
+class GameServer(object):
+    TICK_RATE = 30
+    WRITE_BUFFER_LIMIT = 1 << 20
+    def __init__(self, map_file, slots, bot_count=0, rooms=1):
+        self._rooms = [Room(map_file, slots, bot_count) for i in range(rooms)]
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self._accept, host, port)
+        async with server:
+            await self._run()
+
+    async def _run(self):
+        interval = 1.0 / self.TICK_RATE
+        deadline = time.monotonic()
+        while True:
+            for room in self._rooms:
+                room.step()
+            deadline += interval
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+
+    def _free_room(self):
+        for room in self._rooms:
+            slot = room.free_slot()
+            if slot is not None: return room, slot
+        return None, None
+
+    async def _accept(self, reader, writer):
+        room, slot = self._free_room()
+        if room is None:
+            writer.close()
+            return
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        writer.write(Message.frame(Message.WELCOME.pack(slot, room.actor_count()) +
+                room.map_file().encode('utf-8')))
+        controller = room.join(writer, slot)
+        try:
+            while True:
+                data = await reader.read(64)
+                if not data: break
+                controller.press(data[-1])
+        except ConnectionError:
+            pass
+        finally:
+            room.leave(writer)
+            writer.close()
+
+class GameClient(object):
+    CONNECT_TIMEOUT = 5.0
+    def __init__(self, host, port):
+        self._host = host
+        self._port = port
+        self._snapshots = queue.Queue()
+        self._welcome = threading.Event()
+        self._error = None
+        self._connected = False
+        self._loop = None
+        self._writer = None
+        self._mask = None
+        self.slot = None
+        self.actor_count = None
+        self.map_file = None
+
+    def start(self, timeout=CONNECT_TIMEOUT):
+        thread = threading.Thread(target=asyncio.run, args=(self._run(),))
+        thread.daemon = True
+        thread.start()
+        if not self._welcome.wait(timeout):
+            raise ConnectionError('no welcome from %s:%d within %.1f seconds' %
+                    (self._host, self._port, timeout))
+        if self._error: raise self._error
+        return self
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        try:
+            reader, self._writer = await asyncio.open_connection(self._host, self._port)
+            self._writer.get_extra_info('socket').setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            welcome = await Message.read(reader)
+        except asyncio.IncompleteReadError:
+            self._error = ConnectionError('%s:%d closed the connection (server full?)' %
+                    (self._host, self._port))
+        except OSError as error:
+            self._error = error
+        if self._error:
+            self._welcome.set()
+            return
+        self.slot, self.actor_count = Message.WELCOME.unpack_from(welcome)
+        self.map_file = welcome[Message.WELCOME.size:].decode('utf-8')
+        self._connected = True
+        self._welcome.set()
+        try:
+            while True:
+                self._snapshots.put(Snapshot.decode(await Message.read(reader)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self._error = ConnectionError('%s:%d closed the connection' %
+                    (self._host, self._port))
+        finally:
+            self._connected = False
+
+    def connected(self):
+        return self._connected
+
+    def error(self):
+        return self._error
+
+    def send(self, keys):
+        if not self._connected: return
+        mask = KeyMask.encode(keys)
+        if mask == self._mask: return
+        self._mask = mask
+        try:
+            self._loop.call_soon_threadsafe(self._writer.write, bytes(bytearray([mask])))
+        except RuntimeError:
+            self._connected = False
+
+    def snapshots(self):
+        while not self._snapshots.empty():
+            yield self._snapshots.get()
+
+class StateMirror(StageHandler):
+    def __init__(self, world, actors):
+        StageHandler.__init__(self, world)
+        self._actors = actors
+        self._states = [[(Snapshot.OFF_MAP, Snapshot.OFF_MAP), (0,), (0,)] for actor in actors]
+
+    def apply(self, entries):
+        moved = [(index, fields[0]) for index, fields in entries if fields[0] is not None]
+        for index, position in moved:
+            self.remove_actor(self._actors[index])
+        for index, position in moved:
+            self._states[index][0] = position
+            if position[0] == Snapshot.OFF_MAP: continue
+            self._actor_map.put(Coordinate(*position), self._actors[index])
+        for index, fields in entries:
+            if fields[1] is None and fields[2] is None: continue
+            state = self._states[index]
+            for field in (1, 2):
+                if fields[field] is not None: state[field] = fields[field]
+            self._actors[index].restore(state[1][0], state[2][0])
+
+def run_client(host, port):
+    from pygameframework.framework import GameRunner
+    from chase import Chase
+    from actor import Actor
+    from actor import Actors
+    from scene import ChaceScene
+    from chase import StatusWindow
+
+    class RemoteChase(Chase):
+        def __init__(self, client):
+            Chase.__init__(self, map_file=client.map_file)
+            self._client = client
+            self._mirror = None
+
+        def initialize(self, screen):
+            Chase.initialize(self, screen)
+            world = self._world
+            actor_list = [Actor(world, player_id)
+                    for player_id in range(self._client.actor_count)]
+            self._mirror = StateMirror(world, actor_list)
+            status_window = StatusWindow(actor_list[:self.MAX_PLAYER], Coordinate(0, 18))
+            slot = self._client.slot
+            cameras = self.cameras(world, screen, actor_list[slot:] + actor_list[:slot])
+            world.scenes().register_chase_scene(
+                    ChaceScene(world, status_window, Actors(actor_list), cameras))
+            world.scenes().change_chase_scene()
+
+        def update(self):
+            self._handle_keyboard()
+            if not self._client.connected():
+                sys.exit('disconnected: %s' % self._client.error())
+            self._client.send(self._controllers[0].pressed_keys())
+            for tick, entries in self._client.snapshots():
+                self._mirror.apply(entries)
+
+    try:
+        client = GameClient(host, port).start()
+    except OSError as error:
+        sys.exit('cannot join %s:%d: %s' % (host, port, error))
+    runner = GameRunner(RemoteChase(client))\
+        .initialize_system()\
+        .initialize_screen(640, 480, 16)\
+        .initialize_controller(1, 'config.ini')\
+        .set_font('Courier New', 18)\
+        .set_fps(30)\
+        .set_caption('*** Chase [%dP] ***' % (client.slot + 1))
+    runner.run()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='networked chase')
+    parser.add_argument('mode', choices=('server', 'client'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--map', default='data/map.data')
+    parser.add_argument('--slots', type=int, default=4)
+    parser.add_argument('--bots', type=int, default=0)
+    parser.add_argument('--rooms', type=int, default=1)
+    args = parser.parse_args(argv)
+    if args.mode == 'server':
+        asyncio.run(GameServer(args.map, args.slots, args.bots, args.rooms).serve(args.host, args.port))
+    else:
+        run_client(args.host, args.port)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,47 +1,69 @@
 # -*- coding: utf-8 -*-
+from itertools import chain
 from stage import StageHandler
 from actor import ActorMap
 from sound import SoundEffect
-from pygameframework import Color
+from ai import DistanceField
+from controller import KeyMask
 from pygameframework import Direction
 
 class PlayerHandler(object):
     (READY, WALK) = range(2)
-    _handlers = []
-    _handle_map = dict()
-
-    @classmethod
-    def initialize(cls, actor_list):
-        cls._handle_map[cls.READY] = [ReadyMode(actor) for actor in actor_list]
-        cls._handle_map[cls.WALK] = [WalkMode(actor) for actor in actor_list]
-        cls._handlers = list(cls._handle_map[cls.READY])
-
-    @classmethod
-    def reset(cls):
-        for handler in cls._handlers:
+    def __init__(self, world):
+        self._world = world
+        self._handlers = []
+        self._handle_map = dict()
+        self._targets_tick = None
+        self._targets = dict()
+
+    def initialize(self, actor_list, bot_count=0):
+        world = self._world
+        players = len(actor_list) - bot_count
+        self._handle_map[self.READY] =\
+                [ReadyMode(world, actor) for actor in actor_list[:players]] +\
+                [BotReadyMode(world, actor) for actor in actor_list[players:]]
+        self._handle_map[self.WALK] =\
+                [WalkMode(world, actor) for actor in actor_list[:players]] +\
+                [BotMode(world, actor) for actor in actor_list[players:]]
+        self._handlers = list(self._handle_map[self.READY])
+
+    def reset(self):
+        for handler in list(self._handlers):
             handler.change_ready_mode()
 
-    @classmethod
-    def update(cls, controllers, keyboard):
-        for handler, controller in zip(cls._handlers, controllers):
+    def update(self, controllers, keyboard):
+        for index, handler in enumerate(self._handlers):
+            controller = controllers[index] if index < len(controllers) else None
             handler.handle(controller, keyboard)
+        self._world.moves().resolve()
 
+    def targets_of(self, chaser):
+        now = self._world.scheduler().now()
+        if self._targets_tick != now:
+            self._targets_tick = now
+            self._targets = {True: [], False: []}
+            actor_map = self._world.actor_map()
+            for actor in actor_map.actors():
+                self._targets[actor.is_chaser()].append(actor_map.coordinate_of(actor))
+        return self._targets[not chaser]
+
+    def change_handle(self, handler, new_handle_id):
+        for i, handle in enumerate(self._handlers):
+            if handle != handler: continue
+            self._handlers[i] = self._handle_map[new_handle_id][i]
+            self._handlers[i].initialize()
+            break
+
+class PlayerMode(StageHandler):
     def change_ready_mode(self):
-        self._change_handle(PlayerHandler.READY)
+        self._world.players().change_handle(self, PlayerHandler.READY)
 
     def change_walk_mode(self):
-        self._change_handle(PlayerHandler.WALK)
-
-    def _change_handle(self, new_handle_id):
-        for i, handle in enumerate(PlayerHandler._handlers):
-            if handle != self: continue
-            PlayerHandler._handlers[i] = PlayerHandler._handle_map[new_handle_id][i]
-            PlayerHandler._handlers[i].initialize()
-            break
+        self._world.players().change_handle(self, PlayerHandler.WALK)
 
 class WalkCommand(StageHandler):
-    def __init__(self, actor):
-        StageHandler.__init__(self)
+    def __init__(self, world, actor):
+        StageHandler.__init__(self, world)
         self._actor = actor
         self._run = False
 
@@ -50,22 +72,101 @@ class WalkCommand(StageHandler):
 
     def execute(self, direction):
         if self._actor.is_waiting(): return
-        pos = self._actor_map.to_coordinate(self._actor, direction)
-        if not self._terrain_map.is_walkable(pos): return
-        other = self._actor_map.actor(pos)
-        if other:
-            self._actor.touch(other)
-            return
-        self._actor_map.move_actor(self._actor, direction)
-        self._actor.wait()
+        self._world.moves().request(self._actor, direction)
+
+class MoveResolver(StageHandler):
+    def __init__(self, world):
+        StageHandler.__init__(self, world)
+        self._actors = []
+        self._directions = []
+
+    def request(self, actor, direction):
+        self._actors.append(actor)
+        self._directions.append(direction)
+
+    def resolve(self):
+        actors, directions = self._actors, self._directions
+        count = len(actors)
+        if not count: return
+        self._actors, self._directions = [], []
+        actor_map, terrain_map = self._actor_map, self._terrain_map
+        start = self._world.scheduler().now() % count
+        touched = set()
+        claimed = set()
+        movers = []
+        for i in chain(range(start, count), range(start)):
+            actor = actors[i]
+            target = actor_map.to_coordinate(actor, directions[i])
+            if not terrain_map.is_walkable(target): continue
+            occupant = actor_map.actor(target)
+            if occupant is None:
+                key = actor_map.key(target)
+                if key in claimed: continue
+                claimed.add(key)
+                movers.append((actor, directions[i]))
+            elif actor.is_chaser() and actor not in touched and occupant not in touched:
+                touched.add(actor)
+                touched.add(occupant)
+                actor.touch(occupant)
+        for actor, direction in movers:
+            if actor in touched: continue
+            actor_map.move_actor(actor, direction)
+            actor.wait()
+
+def direction_table():
+    table = [None] * (KeyMask.DIRECTIONS + 1)
+    for mask in range(len(table)):
+        up, down = mask & KeyMask.UP, mask & KeyMask.DOWN
+        left, right = mask & KeyMask.LEFT, mask & KeyMask.RIGHT
+        if up and left: table[mask] = Direction.UPPER_LEFT
+        elif up and right: table[mask] = Direction.UPPER_RIGHT
+        elif down and left: table[mask] = Direction.LOWER_LEFT
+        elif down and right: table[mask] = Direction.LOWER_RIGHT
+        elif left: table[mask] = Direction.LEFT
+        elif down: table[mask] = Direction.DOWN
+        elif up: table[mask] = Direction.UP
+        elif right: table[mask] = Direction.RIGHT
+    return tuple(table)
+
+class InputBuffer(object):
+    SIZE = 4
+    def __init__(self):
+        self._times = [0] * self.SIZE
+        self._masks = [0] * self.SIZE
+        self._head = 0
+        self._count = 0
+
+    def clear(self):
+        self._count = 0
 
-class WalkMode(PlayerHandler, StageHandler):
-    def __init__(self, actor):
-        StageHandler.__init__(self)
+    def push(self, time, mask):
+        tail = (self._head + self._count) % self.SIZE
+        self._times[tail] = time
+        self._masks[tail] = mask
+        if self._count < self.SIZE: self._count += 1
+        else: self._head = (self._head + 1) % self.SIZE
+
+    def pop(self, oldest_time):
+        while self._count:
+            time, mask = self._times[self._head], self._masks[self._head]
+            self._head = (self._head + 1) % self.SIZE
+            self._count -= 1
+            if time >= oldest_time: return mask
+        return 0
+
+class WalkMode(PlayerMode):
+    DIRECTION_TABLE = direction_table()
+    BUFFER_FRAMES = 8
+    def __init__(self, world, actor):
+        StageHandler.__init__(self, world)
         self._actor = actor
-        self._walk = WalkCommand(actor)
+        self._walk = WalkCommand(world, actor)
+        self._buffer = InputBuffer()
+        self._last_mask = 0
 
     def initialize(self):
+        self._buffer.clear()
+        self._last_mask = 0
         if self._actor_map.count_actors() is 0:
             self._actor.be_chaser()
         if self._actor_map.count_actors() is 1:
@@ -75,38 +176,100 @@ class WalkMode(PlayerHandler, StageHandler):
             if actor is self._actor: continue
             if not actor.is_chaser(): continue
             actor.freeze()
-        self._actor.flush(Color.WHITE, interval=2, frame=60)
+        self._actor.flush(self._actor.JOIN_COLOR, interval=2, frame=60)
         return self
 
     def handle(self, controller, keyboard=None):
-        self._actor_move(controller.pressed_keys())
+        self._actor_move(KeyMask.pressed(controller))
         if not keyboard: return
         down_keys =  keyboard.pressed_keys()
         if ord('q') in down_keys: sys.exit()
 
-    def _actor_move(self, down_keys):
-        if set(['up', 'left']) <= down_keys: self._walk.execute(Direction.UPPER_LEFT)
-        elif set(['up', 'right']) <= down_keys: self._walk.execute(Direction.UPPER_RIGHT)
-        elif set(['down', 'left']) <= down_keys: self._walk.execute(Direction.LOWER_LEFT)
-        elif set(['down', 'right']) <= down_keys: self._walk.execute(Direction.LOWER_RIGHT)
-        elif 'left' in down_keys: self._walk.execute(Direction.LEFT)
-        elif 'down' in down_keys: self._walk.execute(Direction.DOWN)
-        elif 'up' in down_keys: self._walk.execute(Direction.UP)
-        elif 'right' in down_keys: self._walk.execute(Direction.RIGHT)
-        if 'skill' in down_keys: self._actor.use_skill()
+    def _actor_move(self, mask):
+        directions = mask & KeyMask.DIRECTIONS
+        if self._actor.is_waiting():
+            if directions and directions != self._last_mask:
+                self._buffer.push(self._world.scheduler().now(), directions)
+        else:
+            buffered = self._buffer.pop(self._world.scheduler().now() - self.BUFFER_FRAMES)
+            direction = self.DIRECTION_TABLE[buffered or directions]
+            if direction: self._walk.execute(direction)
+        self._last_mask = directions
+        if mask & KeyMask.SKILL: self._actor.use_skill()
         else: self._actor.unuse_skill()
         # TODO ChaiserのLifeを一定間隔で下落させる。
 
-class ReadyMode(PlayerHandler, StageHandler):
-    def __init__(self, actor):
+class ReadyMode(PlayerMode):
+    def __init__(self, world, actor):
+        StageHandler.__init__(self, world)
         self._actor = actor
 
     def initialize(self):
-        StageHandler.remove_actor(self._actor)
+        self.remove_actor(self._actor)
 
     def handle(self, controller, keyboard=None):
         down_keys =  controller.down_keys()
         if 'start' not in down_keys: return
+        self._join()
+
+    def _join(self):
         SoundEffect.play_join()
         self._actor.be_playing()
         self.change_walk_mode()
+
+class BotMode(WalkMode):
+    DIRECTIONS = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT,
+            Direction.UPPER_LEFT, Direction.UPPER_RIGHT,
+            Direction.LOWER_LEFT, Direction.LOWER_RIGHT)
+    SKILL_DISTANCE = 4
+
+    def handle(self, controller, keyboard=None):
+        chaser = self._actor.is_chaser()
+        targets = self._world.players().targets_of(chaser)
+        field = self._world.distance_fields().toward(chaser, targets) if targets else None
+        if not field:
+            self._actor.unuse_skill()
+            return
+        position = self._actor_map.coordinate_of(self._actor)
+        if field.distance(position) <= self.SKILL_DISTANCE: self._actor.use_skill()
+        else: self._actor.unuse_skill()
+        if self._actor.is_waiting(): return
+        if field.distance(position) == DistanceField.UNREACHABLE:
+            direction = self._wander(position)
+        elif chaser:
+            direction = self._chase(field, position)
+        else:
+            direction = self._run(field, position)
+        if direction: self._walk.execute(direction)
+
+    def _chase(self, field, position):
+        best, best_distance = None, DistanceField.UNREACHABLE
+        for direction in self.DIRECTIONS:
+            to = position + direction
+            if not self._terrain_map.is_walkable(to): continue
+            other = self._actor_map.actor(to)
+            if other and other.is_chaser(): continue
+            distance = field.distance(to)
+            if distance < best_distance: best, best_distance = direction, distance
+        return best
+
+    def _run(self, field, position):
+        best, best_distance = None, field.distance(position)
+        for direction in self.DIRECTIONS:
+            to = position + direction
+            if not self._terrain_map.is_walkable(to): continue
+            if self._actor_map.actor(to): continue
+            distance = field.distance(to)
+            if distance > best_distance: best, best_distance = direction, distance
+        return best
+
+    def _wander(self, position):
+        directions = [direction for direction in self.DIRECTIONS
+                if self._terrain_map.is_walkable(position + direction)
+                and not self._actor_map.actor(position + direction)]
+        if not directions: return None
+        return self._world.random().choice(directions)
+
+class BotReadyMode(ReadyMode):
+    def handle(self, controller, keyboard=None):
+        self._join()
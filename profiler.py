@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from collections import deque
+from pygameframework import Color
+from pygameframework import Coordinate
+from tile import AsciiTileLocator
+
+class FrameProfiler(object):
+    WINDOW = 300
+    DUMP_INTERVAL = 300
+    LINE_WIDTH = 28
+    _enabled = False
+    _visible = False
+    _dump_file = None
+    _frame = 0
+    _samples = dict()
+    _starts = dict()
+    _totals = dict()
+    _gauges = dict()
+
+    @classmethod
+    def enable(cls, dump_file=None):
+        cls._enabled = True
+        cls._dump_file = dump_file
+
+    @classmethod
+    def is_enabled(cls):
+        return cls._enabled
+
+    @classmethod
+    def is_visible(cls):
+        return cls._visible
+
+    @classmethod
+    def toggle_overlay(cls):
+        cls._visible = cls._enabled and not cls._visible
+
+    @classmethod
+    def start(cls, name):
+        if not cls._enabled: return
+        cls._starts[name] = time.perf_counter()
+
+    @classmethod
+    def stop(cls, name):
+        if not cls._enabled: return
+        elapsed = (time.perf_counter() - cls._starts.pop(name)) * 1000
+        cls._totals[name] = cls._totals.get(name, 0.0) + elapsed
+
+    @classmethod
+    def gauge(cls, name, value):
+        if not cls._enabled: return
+        cls._gauges[name] = value
+
+    @classmethod
+    def percentile(cls, name, percent):
+        samples = sorted(cls._samples.get(name, ()))
+        if not samples: return 0.0
+        return samples[min(len(samples) - 1, len(samples) * percent // 100)]
+
+    @classmethod
+    def end_frame(cls):
+        if not cls._enabled: return
+        for name, elapsed in cls._totals.items():
+            if name not in cls._samples: cls._samples[name] = deque(maxlen=cls.WINDOW)
+            cls._samples[name].append(elapsed)
+        cls._totals = dict()
+        cls._frame += 1
+        if cls._dump_file and cls._frame % cls.DUMP_INTERVAL == 0: cls.dump()
+
+    @classmethod
+    def lines(cls):
+        lines = ['%-9s p50 %5.2f p99 %5.2f' %
+                (name, cls.percentile(name, 50), cls.percentile(name, 99))
+                for name in sorted(cls._samples)]
+        lines += ['%-9s %d' % (name, value) for name, value in sorted(cls._gauges.items())]
+        return lines
+
+    @classmethod
+    def render(cls, screen, position):
+        if not cls._visible: return
+        blank = AsciiTileLocator.get_tile(' ', Color.BLACK)
+        x, y = position.xy()
+        for index, line in enumerate(cls.lines()):
+            for dx in range(cls.LINE_WIDTH):
+                screen.draw(Coordinate(x+dx, y+index), blank)
+            screen.write(line, Coordinate(x, y+index), Color.LIME)
+
+    @classmethod
+    def dump(cls):
+        record = dict(frame=cls._frame, time=time.time(), gauges=dict(cls._gauges))
+        for name in cls._samples:
+            record[name] = dict(p50=cls.percentile(name, 50), p99=cls.percentile(name, 99))
+        f = open(cls._dump_file, 'a')
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+        f.close()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import argparse
+import struct
+import sys
+from controller import KeyMask
+from controller import ScriptedController
+
+class InputRecorder(object):
+    MAGIC = b'CHSR'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHIHHH')
+    RUN = struct.Struct('<H')
+    RUN_MAX = 0xFFFF
+    SEED_MAX = 0xFFFFFFFF
+    def __init__(self, filename, map_file, seed, bot_count=0):
+        if not 0 <= seed <= self.SEED_MAX:
+            raise ValueError('seed %d cannot be recorded (must be 0..%d)' % (seed, self.SEED_MAX))
+        self._file = open(filename, 'wb')
+        self._map_file = map_file.encode('utf-8')
+        self._seed = seed
+        self._bot_count = bot_count
+        self._row = None
+        self._run = 0
+
+    def record(self, controllers):
+        row = bytes(bytearray(KeyMask.encode(controller.pressed_keys())
+                for controller in controllers))
+        if self._row is None:
+            self._file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self._seed,
+                self._bot_count, len(row), len(self._map_file)) + self._map_file)
+        elif row != self._row or self._run == self.RUN_MAX:
+            self._flush()
+        self._row = row
+        self._run += 1
+
+    def _flush(self):
+        if not self._run: return
+        self._file.write(self.RUN.pack(self._run) + self._row)
+        self._run = 0
+
+    def close(self):
+        if self._file.closed: return
+        self._flush()
+        self._file.close()
+
+class InputReplay(object):
+    def __init__(self, map_file, seed, bot_count, rows):
+        self.map_file = map_file
+        self.seed = seed
+        self.bot_count = bot_count
+        self._rows = rows
+
+    @classmethod
+    def open(cls, filename):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        invalid = ValueError('%s is not an input recording' % filename)
+        header = InputRecorder.HEADER
+        if len(data) < header.size: raise invalid
+        magic, version, seed, bot_count, width, name_size = header.unpack_from(data)
+        if magic != InputRecorder.MAGIC or version != InputRecorder.VERSION:
+            raise invalid
+        offset = header.size + name_size
+        if offset > len(data): raise invalid
+        try:
+            map_file = data[header.size:offset].decode('utf-8')
+        except UnicodeDecodeError:
+            raise invalid
+        rows = []
+        while offset < len(data):
+            if offset + InputRecorder.RUN.size + width > len(data): raise invalid
+            run, = InputRecorder.RUN.unpack_from(data, offset)
+            offset += InputRecorder.RUN.size
+            rows += [data[offset:offset+width]] * run
+            offset += width
+        return cls(map_file, seed, bot_count, rows)
+
+    def ticks(self):
+        return len(self._rows)
+
+    def controllers(self):
+        width = len(self._rows[0]) if self._rows else 0
+        return [ScriptedController(self._script(index)) for index in range(width)]
+
+    def _script(self, index):
+        for row in self._rows:
+            yield KeyMask.decode(row[index])
+
+def play_headless(replay):
+    from engine import Simulation
+    simulation = Simulation(replay.map_file, replay.controllers(), replay.seed,
+            max_tick=replay.ticks(), bot_count=replay.bot_count).run()
+    print('%d/%d ticks, %d swaps' % (simulation.tick(), replay.ticks(), simulation.swaps()))
+    for rank, member in simulation.ranking().standings():
+        print('%d %dP life %d' % (rank, member.player_id(), member.life()))
+
+def play_realtime(replay):
+    from pygameframework.framework import GameRunner
+    from chase import Chase
+    runner = GameRunner(Chase(replay.bot_count, replay.seed, replay=replay))\
+        .initialize_system()\
+        .initialize_screen(640, 480, 16)\
+        .initialize_controller(1, 'config.ini')\
+        .set_font('Courier New', 18)\
+        .set_fps(30)\
+        .set_caption('*** Chase [replay] ***')
+    runner.run()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='replay a recorded match')
+    parser.add_argument('recording')
+    parser.add_argument('--realtime', action='store_true')
+    args = parser.parse_args(argv)
+    replay = InputReplay.open(args.recording)
+    if args.realtime: play_realtime(replay)
+    else: play_headless(replay)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
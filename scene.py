@@ -1,96 +1,161 @@
 # -*- coding: utf-8 -*-
 from pygameframework import Color
 from pygameframework import Coordinate
+from pygameframework import Direction
 from stage import StageHandler
-from player import PlayerHandler
-from pygameframework import Scheduler
+from profiler import FrameProfiler
+from tile import TextCache
+from score import NullScoreStore
 
-class Scene(object):
+class SceneHandler(object):
     (TITLE, CHASE, RANKING) = range(3)
-    _active_scene = None
-    _scenes = dict()
+    def __init__(self, world):
+        self._world = world
+        self._active_scene = None
+        self._scenes = dict()
 
-    @classmethod
-    def register_title_scene(cls, scene):
-        cls._scenes[cls.TITLE] = scene
+    def register_title_scene(self, scene):
+        self._scenes[self.TITLE] = scene
 
-    @classmethod
-    def register_chase_scene(cls, scene):
-        cls._scenes[cls.CHASE] = scene
+    def register_chase_scene(self, scene):
+        self._scenes[self.CHASE] = scene
 
-    @classmethod
-    def register_ranking_scene(cls, scene):
-        cls._scenes[cls.RANKING] = scene
+    def register_ranking_scene(self, scene):
+        self._scenes[self.RANKING] = scene
 
-    @classmethod
-    def change_title_scene(cls):
-        cls.change_scene(cls._scenes[cls.TITLE])
+    def change_title_scene(self):
+        self.change_scene(self._scenes[self.TITLE])
 
-    @classmethod
-    def change_chase_scene(cls):
-        cls.change_scene(cls._scenes[cls.CHASE])
+    def change_chase_scene(self):
+        self.change_scene(self._scenes[self.CHASE])
 
-    @classmethod
-    def change_ranking_scene(cls):
-        cls.change_scene(cls._scenes[cls.RANKING])
+    def change_ranking_scene(self):
+        self.change_scene(self._scenes[self.RANKING])
 
-    @classmethod
-    def change_scene(cls, new_scene):
-        cls._active_scene = new_scene
-        Scheduler.clear()
+    def change_scene(self, new_scene):
+        scheduler = self._world.scheduler()
+        if self._active_scene: scheduler.clear(self._active_scene)
+        self._active_scene = new_scene
+        scheduler.own(new_scene)
+        self._world.dirty().mark_all()
+        new_scene.enter()
 
-    @classmethod
-    def render(cls, screen):
-        cls._active_scene.render(screen)
+    def render(self, screen):
+        self._active_scene.render(screen)
 
-    @classmethod
-    def update(cls, controller, keyboard):
-        cls._active_scene.update(controller, keyboard)
+    def update(self, controllers, keyboard):
+        self._active_scene.update(controllers, keyboard)
+
+class Scene(object):
+    def __init__(self, world):
+        self._world = world
+
+    def enter(self):
+        pass
 
 class TitleScene(Scene):
     def render(self, screen):
         screen.fill()
-        screen.write('Chaise', Coordinate(0, 0), Color.OLIVE)
+        TextCache.write(screen, 'Chaise', Coordinate(0, 0), Color.OLIVE)
 
     def update(self, controllers, keyboard):
         colors = (Color.YELLOW, Color.GREEN, Color.BLUE, Color.RED)
         for controller in controllers:
             down_keys = controller.down_keys()
             if not down_keys: continue
-            Scene.change_chase_scene()
+            self._world.scenes().change_chase_scene()
 
 class RankingScene(Scene):
-    def __init__(self, actors):
+    RANKING_POSITION = Coordinate(0, 2)
+    RANKING_LINES = 8
+    HIGH_SCORE_POSITION = Coordinate(0, 12)
+    def __init__(self, world, actors, score_store=None):
+        Scene.__init__(self, world)
         self._actors = actors
         self._ranking = actors.ranking()
+        self._score_store = score_store or NullScoreStore()
+        self._top = None
+        self._top_lines = []
+
+    def enter(self):
+        self._score_store.record([(member.player_id(), member.life(), rank)
+                for rank, member in self._ranking.standings()])
 
     def render(self, screen):
         screen.fill()
-        screen.write('Ranking', Coordinate(0, 0), Color.OLIVE)
-        self._ranking.render(screen, Coordinate(0, 2))
-        screen.write('Press [Start]+[Skill] Key', Coordinate(0, 10), Color.YELLOW)
+        TextCache.write(screen, 'Ranking', Coordinate(0, 0), Color.OLIVE)
+        self._ranking.render(screen, self.RANKING_POSITION, self.RANKING_LINES)
+        TextCache.write(screen, 'Press [Start]+[Skill] Key', Coordinate(0, 10), Color.YELLOW)
+        self._render_high_scores(screen, self.HIGH_SCORE_POSITION)
+
+    def _render_high_scores(self, screen, position):
+        top = self._score_store.top()
+        if not top: return
+        if top is not self._top:
+            self._top = top
+            self._top_lines = ['%d. %dP %3d  %s' % (place + 1, slot, score, played_at)
+                    for place, (played_at, slot, score) in enumerate(top)]
+        TextCache.write(screen, 'High Score', position, Color.OLIVE)
+        for line in self._top_lines:
+            position += Direction.DOWN
+            TextCache.write(screen, line, position, Color.WHITE)
 
     def update(self, controllers, keyboard):
         for controller in controllers:
             down_keys = controller.pressed_keys()
             if set(['start', 'skill']) != down_keys: continue
             self._actors.reset()
-            PlayerHandler.reset()
-            Scene.change_chase_scene()
+            self._world.players().reset()
+            self._world.scenes().change_chase_scene()
 
 class ChaceScene(StageHandler, Scene):
-    def __init__(self, status_window, actors):
-        StageHandler.__init__(self)
+    def __init__(self, world, status_window, actors, cameras=()):
+        StageHandler.__init__(self, world)
         self._status_window = status_window
         self._actors = actors
+        self._cameras = cameras
 
     def update(self, controllers, keyboard):
-        PlayerHandler.update(controllers, keyboard)
+        self._world.players().update(controllers, keyboard)
         if self._actors.exists_deadman():
-            Scene.change_ranking_scene()
+            self._world.scenes().change_ranking_scene()
 
     def render(self, screen):
+        dirty = self._world.dirty()
+        if dirty.is_all():
+            self._render_all(screen)
+        else:
+            self._render_dirty(screen, dirty.cells())
+        dirty.clear()
+
+    def _render_all(self, screen):
         screen.fill()
-        self._terrain_map.render(screen)
-        self._actor_map.render(screen)
+        for camera in self._cameras:
+            camera.render()
+        if not self._cameras:
+            FrameProfiler.start('terrain')
+            self._terrain_map.render(screen)
+            FrameProfiler.stop('terrain')
+            FrameProfiler.start('actors')
+            self._actor_map.render(screen)
+            FrameProfiler.stop('actors')
+        FrameProfiler.start('status')
         self._status_window.render(screen)
+        FrameProfiler.stop('status')
+
+    def _render_dirty(self, screen, cells):
+        for camera in self._cameras:
+            camera.render(cells)
+        if not self._cameras:
+            FrameProfiler.start('terrain')
+            for coordinate in cells:
+                self._terrain_map.render_cell(screen, coordinate)
+            FrameProfiler.stop('terrain')
+            FrameProfiler.start('actors')
+            for coordinate in cells:
+                actor = self._actor_map.actor(coordinate)
+                if actor: actor.render(screen, coordinate)
+            FrameProfiler.stop('actors')
+        FrameProfiler.start('status')
+        self._status_window.render_changes(screen)
+        FrameProfiler.stop('status')
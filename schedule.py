@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+class Timer(object):
+    __slots__ = ('_wheel', '_expire', '_callback', '_owner')
+    def __init__(self, wheel, expire, callback, owner):
+        self._wheel = wheel
+        self._expire = expire
+        self._callback = callback
+        self._owner = owner
+
+    def expire(self):
+        return self._expire
+
+    def owner(self):
+        return self._owner
+
+    def is_active(self):
+        return self._callback is not None
+
+    def cancel(self):
+        if not self.is_active(): return
+        self._callback = None
+        self._wheel.release(self)
+
+    def fire(self):
+        if not self.is_active(): return
+        callback = self._callback
+        self._callback = None
+        self._wheel.release(self)
+        callback()
+
+class TimerWheel(object):
+    SLOT_BITS = 6
+    SLOTS = 1 << SLOT_BITS
+    LEVELS = 4
+    def __init__(self):
+        self._now = 0
+        self._wheels = [[[] for slot in range(self.SLOTS)] for level in range(self.LEVELS)]
+        self._overflow = []
+        self._owned = dict()
+        self._count = 0
+
+    def now(self):
+        return self._now
+
+    def count(self):
+        return self._count
+
+    def add(self, delay, callback, owner=None):
+        timer = Timer(self, self._now + max(delay, 1), callback, owner)
+        self._insert(timer)
+        self._owned.setdefault(owner, set()).add(timer)
+        self._count += 1
+        return timer
+
+    def release(self, timer):
+        self._owned[timer.owner()].discard(timer)
+        self._count -= 1
+
+    def clear(self, owner):
+        for timer in list(self._owned.get(owner, ())):
+            timer.cancel()
+
+    def clear_all(self):
+        for owner in list(self._owned):
+            self.clear(owner)
+
+    def advance(self):
+        self._now += 1
+        for level in range(self.LEVELS, 0, -1):
+            if self._now & ((1 << (level * self.SLOT_BITS)) - 1): continue
+            if level == self.LEVELS:
+                timers, self._overflow = self._overflow, []
+            else:
+                timers = self._take(level, self._now)
+            for timer in timers:
+                if timer.is_active(): self._insert(timer)
+        for timer in self._take(0, self._now):
+            timer.fire()
+
+    def _take(self, level, tick):
+        slot = (tick >> (level * self.SLOT_BITS)) & (self.SLOTS - 1)
+        timers = self._wheels[level][slot]
+        self._wheels[level][slot] = []
+        return timers
+
+    def _insert(self, timer):
+        delta = timer.expire() - self._now
+        for level in range(self.LEVELS):
+            if delta < 1 << ((level + 1) * self.SLOT_BITS):
+                slot = (timer.expire() >> (level * self.SLOT_BITS)) & (self.SLOTS - 1)
+                self._wheels[level][slot].append(timer)
+                return
+        self._overflow.append(timer)
+
+class Scheduler(object):
+    def __init__(self):
+        self._wheel = TimerWheel()
+        self._owner = None
+
+    def own(self, owner):
+        self._owner = owner
+
+    def add(self, delay, callback):
+        return self._wheel.add(delay, callback, self._owner)
+
+    def update(self):
+        self._wheel.advance()
+
+    def now(self):
+        return self._wheel.now()
+
+    def clear(self, owner=None):
+        if owner is None:
+            self._wheel.clear_all()
+            return
+        self._wheel.clear(owner)
+
+    def count(self):
+        return self._wheel.count()
+
+class Schedule(object):
+    def __init__(self, scheduler, frame, interval=1):
+        self._scheduler = scheduler
+        self._interval = interval
+        self._action = None
+        self._last = None
+        self._repeat = None
+        self._timer = scheduler.add(frame, self._expire)
+
+    def action(self, function):
+        self._action = function
+        self._repeat = self._scheduler.add(self._interval, self._act)
+        return self
+
+    def last(self, function):
+        self._last = function
+        return self
+
+    def cancel(self):
+        self._timer.cancel()
+        if self._repeat: self._repeat.cancel()
+
+    def _act(self):
+        self._repeat = self._scheduler.add(self._interval, self._act)
+        self._action()
+
+    def _expire(self):
+        if self._repeat: self._repeat.cancel()
+        if self._last: self._last()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import datetime
+import queue
+import sqlite3
+import threading
+
+class NullScoreStore(object):
+    def record(self, results):
+        pass
+
+    def top(self):
+        return []
+
+    def close(self):
+        pass
+
+class ScoreStore(object):
+    TOP_COUNT = 5
+    QUEUE_SIZE = 64
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS scores (id INTEGER PRIMARY KEY,'
+        ' played_at TEXT NOT NULL, slot INTEGER NOT NULL,'
+        ' score INTEGER NOT NULL, rank INTEGER NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS scores_played_at ON scores (played_at)',
+        'CREATE INDEX IF NOT EXISTS scores_slot ON scores (slot)',
+        'CREATE INDEX IF NOT EXISTS scores_score ON scores (score DESC)')
+    def __init__(self, filename, top_count=TOP_COUNT):
+        self._filename = filename
+        self._top_count = top_count
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._dropped = 0
+        connection = self._connect()
+        self._top = connection.execute(
+                'SELECT played_at, slot, score FROM scores'
+                ' ORDER BY score DESC, played_at LIMIT ?', (top_count,)).fetchall()
+        connection.close()
+        self._writer = threading.Thread(target=self._write)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self._filename)
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        connection.commit()
+        return connection
+
+    def record(self, results):
+        played_at = datetime.datetime.now().isoformat(' ', 'seconds')
+        rows = [(played_at, slot, score, rank) for slot, score, rank in results]
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            self._dropped += 1
+            return
+        top = self._top + [(played_at, slot, score) for slot, score, rank in results]
+        top.sort(key=lambda row: (-row[2], row[0]))
+        self._top = top[:self._top_count]
+
+    def top(self):
+        return self._top
+
+    def dropped(self):
+        return self._dropped
+
+    def _write(self):
+        connection = self._connect()
+        while True:
+            rows = self._queue.get()
+            if rows is None: break
+            connection.executemany(
+                    'INSERT INTO scores (played_at, slot, score, rank) VALUES (?, ?, ?, ?)',
+                    rows)
+            connection.commit()
+        connection.close()
+
+    def close(self):
+        if not self._writer.is_alive(): return
+        self._queue.put(None)
+        self._writer.join()
@@ -1,15 +1,75 @@
 # -*- coding: utf-8 -*-
-from pygameframework import Sound
+import pygame
+from profiler import FrameProfiler
+
+class NullSoundBank(object):
+    def load(self, name, filename):
+        return self
+
+    def play(self, name):
+        pass
+
+    def play_bgm(self, filename):
+        pass
+
+class SoundBank(object):
+    CHANNELS = 8
+    def __init__(self, channels=CHANNELS):
+        if not pygame.mixer.get_init(): pygame.mixer.init()
+        pygame.mixer.set_num_channels(channels)
+        self._sounds = dict()
+        self._channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        self._started = [0] * channels
+        self._plays = 0
+
+    def load(self, name, filename):
+        self._sounds[name] = pygame.mixer.Sound(filename)
+        return self
+
+    def play(self, name):
+        index = self._free_channel()
+        self._plays += 1
+        self._started[index] = self._plays
+        self._channels[index].play(self._sounds[name])
+
+    def _free_channel(self):
+        for index, channel in enumerate(self._channels):
+            if not channel.get_busy(): return index
+        oldest = self._started.index(min(self._started))
+        self._channels[oldest].stop()
+        return oldest
+
+    def play_bgm(self, filename):
+        pygame.mixer.music.load(filename)
+        pygame.mixer.music.play(-1)
 
 class SoundEffect(object):
+    EFFECTS = (('touch', 'data/touch.ogg'), ('join', 'data/join.ogg'))
+    BGM = 'data/bgm.ogg'
+    _bank = NullSoundBank()
+
+    @classmethod
+    def provide(cls, bank):
+        for name, filename in cls.EFFECTS:
+            bank.load(name, filename)
+        cls._bank = bank
+
     @classmethod
     def play_touch(cls):
-        Sound.play('data/touch.ogg')
+        cls._play('touch')
 
     @classmethod
     def play_join(cls):
-        Sound.play('data/join.ogg')
+        cls._play('join')
 
     @classmethod
     def play_bgm(cls):
-        Sound.play_bgm('data/bgm.ogg')
+        FrameProfiler.start('sound')
+        cls._bank.play_bgm(cls.BGM)
+        FrameProfiler.stop('sound')
+
+    @classmethod
+    def _play(cls, name):
+        FrameProfiler.start('sound')
+        cls._bank.play(name)
+        FrameProfiler.stop('sound')
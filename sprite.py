@@ -2,18 +2,32 @@
 from tile import AsciiTileLocator
 
 class Sprite(object):
-    def __init__(self, glyph, color):
+    __slots__ = ('_graphic', '_glyph', '_color', '_original_color', '_position', '_visible',
+            '_dirty')
+    def __init__(self, glyph, color, dirty):
         self._graphic = AsciiTileLocator.get_tile(glyph, color)
         self._glyph = glyph
         self._color = color
         self._original_color = color
+        self._position = None
+        self._visible = True
+        self._dirty = dirty
 
     def color(self):
         return self._color
 
     def render(self, screen, position):
+        if not self._visible: return
         screen.draw(position, self._graphic)
 
+    def locate(self, position):
+        self._position = position
+
+    def show(self, visible):
+        if self._visible == visible: return
+        self._visible = visible
+        self._mark_dirty()
+
     def change_color(self, new_color):
         self._color = new_color
         self._update()
@@ -30,7 +44,8 @@ class Sprite(object):
 
     def _update(self):
         self._graphic = AsciiTileLocator.get_tile(self._glyph, self._color)
+        self._mark_dirty()
 
-
-
-
+    def _mark_dirty(self):
+        if self._position is None: return
+        self._dirty.mark(self._position)
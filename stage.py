@@ -1,21 +1,20 @@
 # -*- coding: utf-8 -*-
-import random
 from terrain import TerrainMapHandler
-from actor import ActorMap
 
 class StageHandler(TerrainMapHandler):
-    _actor_map = None
+    def __init__(self, world):
+        self._world = world
 
-    @classmethod
-    def initialize(cls):
-        TerrainMapHandler.initialize()
-        cls._actor_map = ActorMap()
+    @property
+    def _terrain_map(self):
+        return self._world.terrain_map()
 
-    def choice_random_open_coordinate(self):
-       return random.choice([c for c in self._terrain_map.walkable_coordinates()\
-               if not self._actor_map.actor(c)])
+    @property
+    def _actor_map(self):
+        return self._world.actor_map()
 
-    @classmethod
-    def remove_actor(cls, actor):
-        cls._actor_map.remove_actor(actor)
+    def choice_random_open_coordinate(self):
+        return self._world.actor_map().choice_free_coordinate(self._world.random())
 
+    def remove_actor(self, actor):
+        self._world.actor_map().remove_actor(actor)
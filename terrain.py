@@ -1,13 +1,20 @@
 # -*- coding: utf-8 -*-
+import pygame
+from collections import OrderedDict
 from pygameframework import AsciiTileSheet
+from pygameframework import GridWindow
 from pygameframework import Color
 from pygameframework import Coordinate
 from tile import AsciiTileLocator
+from mapfile import MapFile
 
 class Terrain(object):
     (WALKABLE,) = range(1)
     def __init__(self, glyph, color):
-        self._graphic = AsciiTileLocator.get_tile(glyph, color)
+        self._glyph = glyph
+        self._color = color
+        self._sheet = None
+        self._graphic = None
         self._properties = set()
 
     def walkable(self):
@@ -18,58 +25,183 @@ class Terrain(object):
         return self.WALKABLE in self._properties
 
     def lender(self, screen, coordinate):
+        if self._sheet is not AsciiTileLocator.sheet:
+            self._sheet = AsciiTileLocator.sheet
+            self._graphic = AsciiTileLocator.get_tile(self._glyph, self._color)
         screen.draw(coordinate, self._graphic)
 
+class ChunkLayer(object):
+    CHUNK = 16
+    CACHE_SIZE = 64
+    def __init__(self, grid_size):
+        self._grid_size = grid_size
+        self._chunks = OrderedDict()
+        self._source = None
+
+    def render(self, surface, position, terrain_map, origin, size):
+        source = (terrain_map, terrain_map.revision())
+        if source != self._source:
+            self._source = source
+            self._chunks = OrderedDict()
+        gw, gh = self._grid_size.xy()
+        ox, oy = origin.xy()
+        w, h = size.xy()
+        mw, mh = terrain_map.size()
+        right, bottom = min(ox + w, mw), min(oy + h, mh)
+        px, py = position.xy()
+        surface.set_clip(pygame.Rect(px, py, w * gw, h * gh))
+        for cy in range(oy // self.CHUNK, (bottom - 1) // self.CHUNK + 1):
+            for cx in range(ox // self.CHUNK, (right - 1) // self.CHUNK + 1):
+                chunk = self._chunk(terrain_map, cx, cy)
+                surface.blit(chunk, (px + (cx * self.CHUNK - ox) * gw,
+                                     py + (cy * self.CHUNK - oy) * gh))
+        surface.set_clip(None)
+
+    def _chunk(self, terrain_map, cx, cy):
+        key = (cx, cy)
+        if key in self._chunks:
+            chunk = self._chunks.pop(key)
+        else:
+            chunk = self._bake(terrain_map, cx, cy)
+            if len(self._chunks) >= self.CACHE_SIZE: self._chunks.popitem(last=False)
+        self._chunks[key] = chunk
+        return chunk
+
+    def _bake(self, terrain_map, cx, cy):
+        mw, mh = terrain_map.size()
+        left, top = cx * self.CHUNK, cy * self.CHUNK
+        right, bottom = min(left + self.CHUNK, mw), min(top + self.CHUNK, mh)
+        gw, gh = self._grid_size.xy()
+        chunk = pygame.Surface(((right - left) * gw, (bottom - top) * gh))
+        window = GridWindow(chunk, Coordinate(0, 0), self._grid_size)
+        terrain_map.render_tiles_in(window, Coordinate(left, top), Coordinate(right, bottom))
+        return chunk
+
 class TerrainMap(object):
-    def __init__(self, width, height):
-        floor = Terrain('.', Color.SILVER).walkable()
-        self._terrain = [[floor for x in range(width)] for y in range(height)]
+    WALKABLE = b'\x01'
+    def __init__(self, width, height, palette=None, ids=None, walkable=None):
+        if palette is None:
+            palette = [Terrain('.', Color.SILVER).walkable()]
+            ids = bytearray(width * height)
+            walkable = bytearray(self.WALKABLE * (width * height))
+        self._width = width
+        self._height = height
+        self._palette = palette
+        self._palette_id = dict((terrain, i) for i, terrain in enumerate(palette))
+        self._ids = ids
+        self._walkable = walkable
+        self._revision = 0
+
+    def size(self):
+        return (self._width, self._height)
+
+    def revision(self):
+        return self._revision
 
     def render(self, screen):
-        for y, line in enumerate(self._terrain):
-            for x, tile in enumerate(line):
-                tile.lender(screen, Coordinate(x, y))
+        self.render_tiles(screen)
+
+    def render_tiles(self, screen):
+        palette = self._palette
+        for index, terrain_id in enumerate(memoryview(self._ids)):
+            y, x = divmod(index, self._width)
+            palette[terrain_id].lender(screen, Coordinate(x, y))
+
+    def render_tiles_in(self, screen, top_left, bottom_right):
+        palette, ids = self._palette, self._ids
+        left, top = top_left.xy()
+        right, bottom = bottom_right.xy()
+        for y in range(top, bottom):
+            line = y * self._width
+            for x in range(left, right):
+                palette[ids[line + x]].lender(screen, Coordinate(x - left, y - top))
+
+    def render_cell(self, screen, coordinate, position=None):
+        x, y = coordinate.xy()
+        self._palette[self._ids[y * self._width + x]].lender(screen, position or coordinate)
 
     def put(self, terrain, coordinate):
         x, y = coordinate.xy()
-        self._terrain[y][x] = terrain
+        index = y * self._width + x
+        self._ids[index] = self._terrain_id(terrain)
+        self._walkable[index] = 1 if terrain.is_walkable() else 0
+        self._revision += 1
+
+    def _terrain_id(self, terrain):
+        if terrain not in self._palette_id:
+            self._palette_id[terrain] = len(self._palette)
+            self._palette.append(terrain)
+        return self._palette_id[terrain]
 
     def is_walkable(self, coordinate):
         x, y = coordinate.xy()
-        return self._terrain[y][x].is_walkable()
+        return self._walkable[y * self._width + x] == 1
+
+    def index(self, coordinate):
+        x, y = coordinate.xy()
+        return y * self._width + x
+
+    def walkable_mask(self):
+        return self._walkable
+
+    def count_walkable(self):
+        return self._walkable[:].count(self.WALKABLE)
 
     def walkable_coordinates(self):
-        for y, line in enumerate(self._terrain):
-            for x, tile in enumerate(line):
-                if self._terrain[y][x].is_walkable():
-                    yield Coordinate(x, y)
+        return self.walkable_coordinates_in(
+                Coordinate(0, 0), Coordinate(self._width, self._height))
+
+    def walkable_coordinates_in(self, top_left, bottom_right):
+        left, top = top_left.xy()
+        right, bottom = bottom_right.xy()
+        left, top = max(left, 0), max(top, 0)
+        right, bottom = min(right, self._width), min(bottom, self._height)
+        for y in range(top, bottom):
+            line = y * self._width
+            index = self._walkable.find(self.WALKABLE, line + left, line + right)
+            while index >= 0:
+                yield Coordinate(index - line, y)
+                index = self._walkable.find(self.WALKABLE, index + 1, line + right)
 
 class TerrainMapHandler(object):
-    _terrain_map = None
+    TERRAINS = (('.', Color.SILVER, True),
+                ('#', Color.SILVER, False),
+                (' ', Color.BLACK, False))
     _terrain_db = dict()
+    _terrain_maps = dict()
 
     @classmethod
     def load(cls, filename):
-        f = open(filename, 'r')
-        lines = [line.rstrip('\n') for line in f]
-        w, h = len(lines[0]), len(lines)
-        cls._terrain_map = TerrainMap(w, h)
-        for y, line in enumerate(lines):
-            for x, glyph in enumerate(line):
-                cls.put_terrain(glyph, Coordinate(x, y))
-        f.close()
+        if filename in cls._terrain_maps: return cls._terrain_maps[filename]
+        if MapFile.is_compiled(filename):
+            w, h, glyphs, ids, walkable = MapFile.open(filename)
+        else:
+            w, h, glyphs, ids, walkable = MapFile.read_text(filename, cls.walkable_glyphs())
+        palette = [cls._terrain_db[glyph] for glyph in glyphs]
+        cls._terrain_maps[filename] = TerrainMap(w, h, palette, ids, walkable)
+        return cls._terrain_maps[filename]
+
+    @classmethod
+    def terrain(cls, glyph):
+        return cls._terrain_db[glyph]
 
     @classmethod
     def initialize(cls):
-        cls._terrain_map = TerrainMap(80, 20)
-        cls._initialize_db()
+        if cls._terrain_db: return
+        for glyph, color, walkable in cls.TERRAINS:
+            terrain = Terrain(glyph, color)
+            if walkable: terrain.walkable()
+            cls._terrain_db[glyph] = terrain
+
+    @classmethod
+    def walkable_glyphs(cls):
+        return set(glyph for glyph, color, walkable in cls.TERRAINS if walkable)
 
     @classmethod
-    def _initialize_db(cls):
-        cls._terrain_db['.'] = Terrain('.', Color.SILVER).walkable()
-        cls._terrain_db['#'] = Terrain('#', Color.SILVER)
-        cls._terrain_db[' '] = Terrain(' ', Color.BLACK)
+    def glyph_colors(cls):
+        for glyph, color, walkable in cls.TERRAINS:
+            yield (glyph, color)
 
     @classmethod
-    def put_terrain(cls, name, coordinate):
-        cls._terrain_map.put(cls._terrain_db[name], coordinate)
+    def put_terrain(cls, terrain_map, name, coordinate):
+        terrain_map.put(cls._terrain_db[name], coordinate)
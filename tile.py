@@ -1,10 +1,77 @@
 # -*- coding: utf-8 -*-
+from collections import OrderedDict
+from pygameframework import Coordinate
+
+class NullTileSheet(object):
+    def get_tile(self, glyph, color):
+        return None
+
 class AsciiTileLocator(object):
+    CACHE_SIZE = 256
     sheet = None
+    _atlas = dict()
+    _cache = OrderedDict()
+    _hits = 0
+    _misses = 0
+
     @classmethod
     def provide(cls, new_sheet):
         cls.sheet = new_sheet
+        cls._atlas = dict()
+        cls._cache = OrderedDict()
+        cls._hits = cls._misses = 0
+        TextCache.clear()
+
+    @classmethod
+    def prewarm(cls, glyph_colors):
+        for glyph, color in glyph_colors:
+            cls._atlas[(glyph, color)] = cls.sheet.get_tile(glyph, color)
 
     @classmethod
     def get_tile(cls, glyph, color):
-        return cls.sheet.get_tile(glyph, color)
+        key = (glyph, color)
+        if key in cls._atlas:
+            cls._hits += 1
+            return cls._atlas[key]
+        if key in cls._cache:
+            cls._hits += 1
+            tile = cls._cache.pop(key)
+        else:
+            cls._misses += 1
+            tile = cls.sheet.get_tile(glyph, color)
+            if len(cls._cache) >= cls.CACHE_SIZE: cls._cache.popitem(last=False)
+        cls._cache[key] = tile
+        return tile
+
+    @classmethod
+    def hits(cls):
+        return cls._hits
+
+    @classmethod
+    def misses(cls):
+        return cls._misses
+
+class TextCache(object):
+    CACHE_SIZE = 64
+    _cache = OrderedDict()
+
+    @classmethod
+    def clear(cls):
+        cls._cache = OrderedDict()
+
+    @classmethod
+    def tiles(cls, text, color):
+        key = (text, color)
+        if key in cls._cache:
+            tiles = cls._cache.pop(key)
+        else:
+            tiles = tuple(AsciiTileLocator.get_tile(glyph, color) for glyph in text)
+            if len(cls._cache) >= cls.CACHE_SIZE: cls._cache.popitem(last=False)
+        cls._cache[key] = tiles
+        return tiles
+
+    @classmethod
+    def write(cls, screen, text, position, color):
+        x, y = position.xy()
+        for dx, tile in enumerate(cls.tiles(text, color)):
+            screen.draw(Coordinate(x+dx, y), tile)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import random
+from terrain import TerrainMapHandler
+from actor import ActorMap
+from player import PlayerHandler
+from player import MoveResolver
+from scene import SceneHandler
+from schedule import Scheduler
+from dirty import DirtyCells
+from ai import DistanceFields
+
+class World(object):
+    def __init__(self, seed=None):
+        TerrainMapHandler.initialize()
+        self._random = random.Random(seed)
+        self._dirty = DirtyCells()
+        self._scheduler = Scheduler()
+        self._terrain_map = None
+        self._actor_map = ActorMap(self._dirty)
+        self._moves = MoveResolver(self)
+        self._distance_fields = DistanceFields(self)
+        self._players = PlayerHandler(self)
+        self._scenes = SceneHandler(self)
+
+    def load(self, filename):
+        self.provide(TerrainMapHandler.load(filename))
+        return self
+
+    def provide(self, terrain_map):
+        self._terrain_map = terrain_map
+        self._actor_map.open(terrain_map)
+        return self
+
+    def random(self):
+        return self._random
+
+    def dirty(self):
+        return self._dirty
+
+    def scheduler(self):
+        return self._scheduler
+
+    def terrain_map(self):
+        return self._terrain_map
+
+    def actor_map(self):
+        return self._actor_map
+
+    def distance_fields(self):
+        return self._distance_fields
+
+    def moves(self):
+        return self._moves
+
+    def players(self):
+        return self._players
+
+    def scenes(self):
+        return self._scenes